@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from database import DatabaseManager
+from http_client import DEFAULT_TIMEOUTS, UpstreamLatency
+from metrics import metrics_from_env
+from notification_service import NotificationService
+from outbox_worker import OutboxWorker
+from wallet_service import WalletService
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    raise ImportError("api_server.py requires aiohttp (pip install aiohttp)")
+
+load_dotenv()
+
+# Seconds a prepared transaction stays executable, as in the Streamlit app
+TRANSACTION_TTL_SECONDS = 30
+
+# Most derivation paths one import may scan; each costs a key derivation on the crypto pool
+MAX_SCAN_ACCOUNTS = 100
+
+class AsyncWalletAPI:
+    """asyncio JSON API over WalletService
+    
+    SQLite reads/writes and key derivation / signature checks run on two bounded
+    thread pools; quotes and prices are fetched with aiohttp, so the event loop
+    never blocks and slow upstreams only hold a coroutine.
+    
+    Prepared transactions are kept in this process, keyed by a random
+    transaction_id that is also signed; execute consumes it once.
+    """
+    
+    def __init__(self, wallet_service: WalletService, db_workers: int = 8,
+                 crypto_workers: Optional[int] = None, queue_factor: int = 4,
+                 http_connections: int = 100, transaction_ttl: float = TRANSACTION_TTL_SECONDS):
+        self.wallet_service = wallet_service
+        self.transaction_ttl = transaction_ttl
+        # transaction_id -> prepared transaction, oldest first
+        self._prepared: "OrderedDict[str, Dict]" = OrderedDict()
+        crypto_workers = crypto_workers or os.cpu_count() or 4
+        self._db_pool = ThreadPoolExecutor(db_workers, thread_name_prefix="api-db")
+        self._crypto_pool = ThreadPoolExecutor(crypto_workers, thread_name_prefix="api-crypto")
+        # At most queue_factor jobs per worker are queued; further requests wait
+        # on the semaphore instead of growing the executor queue without bound
+        self._db_slots = asyncio.Semaphore(db_workers * queue_factor)
+        self._crypto_slots = asyncio.Semaphore(crypto_workers * queue_factor)
+        self.http_connections = http_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        # aiohttp calls bypass HttpClient, so time them here for metrics.py
+        self.http_latency = UpstreamLatency()
+        self._price_task: Optional[asyncio.Task] = None
+        self._eth_price: Optional[float] = None
+        self._price_lock = asyncio.Lock()
+    
+    async def _run_db(self, fn, *args, **kwargs):
+        async with self._db_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._db_pool, lambda: fn(*args, **kwargs))
+    
+    async def _run_crypto(self, fn, *args, **kwargs):
+        async with self._crypto_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._crypto_pool, lambda: fn(*args, **kwargs))
+    
+    # Upstreams
+    
+    async def _request(self, method: str, url: str, upstream: str, **kwargs) -> Tuple[int, Optional[Dict]]:
+        """Send an aiohttp request timed under `upstream`, like HttpClient; returns (status, JSON body or None)"""
+        start = time.perf_counter()
+        try:
+            async with self._session.request(
+                method, url, timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUTS[upstream]), **kwargs
+            ) as response:
+                if response.status != 200:
+                    return response.status, None
+                return response.status, await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.http_latency.record_error(upstream)
+            raise
+        finally:
+            self.http_latency.observe(upstream, (time.perf_counter() - start) * 1000)
+    
+    async def _fetch_eth_price(self) -> float:
+        """ETH/USD from CoinGecko; also refreshes WalletService's price cache"""
+        status, data = await self._request(
+            'GET', f"{self.wallet_service.coingecko_url}/simple/price", 'coingecko',
+            params={"ids": "ethereum", "vs_currencies": "usd"}
+        )
+        if status != 200:
+            raise ValueError(f"CoinGecko returned HTTP {status}")
+        price = float(data['ethereum']['usd'])
+        self._eth_price = price
+        self.wallet_service.price_cache.put('ethereum:usd', price)
+        return price
+    
+    async def _refresh_prices(self):
+        """Keep the ETH price fresh in the background so no request waits on it"""
+        while True:
+            try:
+                await self._fetch_eth_price()
+            except Exception as e:
+                print(f"[AsyncWalletAPI] ETH price refresh failed: {e}")
+            await asyncio.sleep(max(1.0, self.wallet_service.price_cache.ttl / 2))
+    
+    async def _current_eth_price(self) -> float:
+        if self._eth_price is None:
+            async with self._price_lock:
+                if self._eth_price is None:
+                    try:
+                        await self._fetch_eth_price()
+                    except Exception:
+                        return 3000.0  # Fallback price, as in WalletService
+        return self._eth_price
+    
+    async def _fetch_quote(self, usd_amount: float) -> Dict:
+        """Routed Skip quote, falling back to the price feed like WalletService"""
+        error = None
+        try:
+            status, data = await self._request('POST', self.wallet_service.skip_url, 'skip',
+                                               json=self.wallet_service._skip_quote_payload(usd_amount))
+            if status == 200:
+                return self.wallet_service._quote_from_skip(usd_amount, data)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            error = str(e)
+        
+        eth_price = await self._current_eth_price()
+        quote = {
+            'success': True,
+            'eth_amount': usd_amount / eth_price,
+            'usd_amount': usd_amount,
+            'rate': eth_price,
+            'fallback': True
+        }
+        if error:
+            quote['error'] = error
+        return quote
+    
+    async def quote(self, usd_amount: float) -> Dict:
+        return await self.wallet_service.quote_engine.aquote(usd_amount, self._fetch_quote)
+    
+    # Handlers
+    
+    async def create_wallet(self, request: web.Request) -> web.Response:
+        mnemonic, address = await self._run_crypto(self.wallet_service.create_wallet)
+        return web.json_response({'success': True, 'address': address, 'mnemonic': mnemonic}, status=201)
+    
+    async def import_wallet(self, request: web.Request) -> web.Response:
+        body = await _json_body(request)
+        scan_accounts = _field(body, 'scan_accounts', int) if 'scan_accounts' in body else 1
+        if not 1 <= scan_accounts <= MAX_SCAN_ACCOUNTS:
+            raise ValueError(f"scan_accounts must be between 1 and {MAX_SCAN_ACCOUNTS}")
+        address, account_index = await self._run_crypto(self.wallet_service.import_wallet,
+                                                        _field(body, 'mnemonic', str),
+                                                        scan_accounts)
+        return web.json_response({'success': True, 'address': address, 'account_index': account_index})
+    
+    async def get_balance(self, request: web.Request) -> web.Response:
+        address = request.match_info['address']
+        balance = await self._run_db(self.wallet_service.get_balance, address)
+        return web.json_response({'success': True, 'address': address, 'balance': balance})
+    
+    async def get_history(self, request: web.Request) -> web.Response:
+        address = request.match_info['address']
+        try:
+            limit = min(max(int(request.query.get('limit', 50)), 1), 200)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        transactions = await self._run_db(
+            self.wallet_service.get_transaction_history, address,
+            before=request.query.get('before'), limit=limit,
+            direction=request.query.get('direction'), counterparty=request.query.get('counterparty'),
+            since=request.query.get('since'), until=request.query.get('until')
+        )
+        return web.json_response({
+            'success': True,
+            'transactions': transactions,
+            'next_cursor': transactions[-1]['cursor'] if len(transactions) == limit else None
+        })
+    
+    async def prepare_transaction(self, request: web.Request) -> web.Response:
+        body = await _json_body(request)
+        currency = str(body.get('currency', 'ETH')).upper()
+        if currency not in ('ETH', 'USD'):
+            raise ValueError("currency must be ETH or USD")
+        amount = _field(body, 'amount', float)
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        
+        quote = await self.quote(amount) if currency == 'USD' else None
+        transaction_id = os.urandom(16).hex()
+        transaction = await self._run_db(
+            self.wallet_service.prepare_transaction,
+            _field(body, 'from_address', str), _field(body, 'to_address', str), amount, currency,
+            quote=quote, nonce=transaction_id
+        )
+        transaction['transaction_id'] = transaction_id
+        self._expire_prepared()
+        self._prepared[transaction_id] = transaction
+        return web.json_response({'success': True, 'transaction': transaction})
+    
+    async def execute_transaction(self, request: web.Request) -> web.Response:
+        """Execute a prepared transaction: the client sends only its transaction_id and signature"""
+        body = await _json_body(request)
+        signature = _field(body, 'signature', str)
+        # Removed before any await, so a concurrent replay finds nothing
+        transaction = self._prepared.pop(_field(body, 'transaction_id', str), None)
+        if transaction is None:
+            raise ValueError("Unknown, expired or already executed transaction")
+        if time.time() - transaction['created_at'] > self.transaction_ttl:
+            raise ValueError("Transaction expired")
+        
+        original_usd_amount = transaction['original_usd_amount']
+        original_eth_price = transaction['original_eth_price']
+        current_quote = None
+        if original_usd_amount and original_eth_price:
+            current_quote = await self.quote(float(original_usd_amount))
+        
+        # Signature recovery dominates, so this runs on the crypto pool
+        result = await self._run_crypto(
+            self.wallet_service.execute_transaction,
+            transaction['from_address'], transaction['to_address'], transaction['amount_eth'],
+            signature, transaction['message'], original_usd_amount, original_eth_price,
+            notify=bool(body.get('notify', False)), current_quote=current_quote,
+            nonce=transaction['nonce']
+        )
+        return web.json_response(result, status=200 if result['success'] else 422)
+    
+    def _expire_prepared(self):
+        """Drop prepared transactions older than the TTL (they are stored oldest first)"""
+        cutoff = time.time() - self.transaction_ttl
+        while self._prepared:
+            oldest = next(iter(self._prepared.values()))
+            if oldest['created_at'] > cutoff:
+                break
+            self._prepared.popitem(last=False)
+    
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok', 'eth_usd': self._eth_price})
+    
+    # Application
+    
+    @web.middleware
+    async def _errors(self, request: web.Request, handler):
+        try:
+            return await handler(request)
+        except ValueError as e:
+            return web.json_response({'success': False, 'error': str(e)}, status=400)
+    
+    async def _startup(self, app: web.Application):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.http_connections))
+        self._price_task = asyncio.create_task(self._refresh_prices())
+    
+    async def _cleanup(self, app: web.Application):
+        if self._price_task is not None:
+            self._price_task.cancel()
+        await self._session.close()
+        self._db_pool.shutdown(wait=True)
+        self._crypto_pool.shutdown(wait=True)
+    
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._errors])
+        app.add_routes([
+            web.get('/health', self.health),
+            web.post('/wallets', self.create_wallet),
+            web.post('/wallets/import', self.import_wallet),
+            web.get('/wallets/{address}/balance', self.get_balance),
+            web.get('/wallets/{address}/transactions', self.get_history),
+            web.post('/transactions/prepare', self.prepare_transaction),
+            web.post('/transactions/execute', self.execute_transaction)
+        ])
+        app.on_startup.append(self._startup)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+async def _json_body(request: web.Request) -> Dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+def _field(body: Dict, name: str, convert):
+    """Required body field converted with `convert` (ValueError -> HTTP 400)"""
+    if body.get(name) is None:
+        raise ValueError(f"Missing field: {name}")
+    try:
+        return convert(body[name])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid field: {name}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless JSON API for the Mock Web3 Wallet")
+    parser.add_argument('--host', default=os.getenv('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', '8080')))
+    parser.add_argument('--db', default='wallet.db', help='SQLite database path')
+    parser.add_argument('--db-workers', type=int, default=int(os.getenv('API_DB_WORKERS', '8')))
+    parser.add_argument('--crypto-workers', type=int, default=None, help='default: CPU count')
+    parser.add_argument('--group-commit', action='store_true', help='batch concurrent transfer commits')
+    args = parser.parse_args(argv)
+    
+    metrics_from_env()
+    db = DatabaseManager(args.db, group_commit=args.group_commit)
+    api = AsyncWalletAPI(WalletService(db), db_workers=args.db_workers, crypto_workers=args.crypto_workers)
+    # Emails for notify=true executions are sent from the outbox, as in app.py
+    outbox_worker = OutboxWorker(db, NotificationService())
+    outbox_worker.start()
+    try:
+        web.run_app(api.build_app(), host=args.host, port=args.port,
+                    print=lambda message: print(f"[AsyncWalletAPI] {message}"))
+    finally:
+        outbox_worker.stop()
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,16 @@ import os
 from dotenv import load_dotenv
 from wallet_service import WalletService
 from database import DatabaseManager
+from metrics import metrics_from_env
 from notification_service import NotificationService
+from outbox_worker import OutboxWorker
+from batch_payout import parse_payout_legs
+import io
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+from collections import OrderedDict
+from utils import validate_ethereum_address
 
 # Load environment variables
 load_dotenv()
@@ -14,20 +20,40 @@ load_dotenv()
 # Initialize services
 @st.cache_resource
 def init_services():
+    # Prometheus metrics on METRICS_PORT (off unless set)
+    metrics_from_env()
     db = DatabaseManager()
     wallet_service = WalletService(db)
     notification_service = NotificationService()
-    return db, wallet_service, notification_service
+    # Transaction emails are queued in the database and sent in the background
+    outbox_worker = OutboxWorker(db, notification_service)
+    outbox_worker.start()
+    return db, wallet_service, notification_service, outbox_worker
 
-db, wallet_service, notification_service = init_services()
+db, wallet_service, notification_service, outbox_worker = init_services()
+
+# Seconds a prepared transaction stays signable
+TRANSACTION_TTL_SECONDS = 30
+# Transaction history rows per page, and pages cached per session
+HISTORY_PAGE_SIZE = 25
+HISTORY_CACHE_PAGES = 20
 
 # Initialize session state
 if 'wallet_address' not in st.session_state:
     st.session_state.wallet_address = None
 if 'mnemonic' not in st.session_state:
     st.session_state.mnemonic = None
+    st.session_state.account_index = 0
 if 'pending_transaction' not in st.session_state:
     st.session_state.pending_transaction = None
+if 'pending_payout' not in st.session_state:
+    st.session_state.pending_payout = None
+if 'history_export' not in st.session_state:
+    st.session_state.history_export = None
+if 'history_cache' not in st.session_state:
+    st.session_state.history_cache = OrderedDict()
+    st.session_state.history_filters = None
+    st.session_state.history_cursors = [None]
 
 def main():
     st.title("🔐 Mock Web3 Wallet")
@@ -48,6 +74,7 @@ def main():
                     try:
                         mnemonic, address = wallet_service.create_wallet()
                         st.session_state.mnemonic = mnemonic
+                        st.session_state.account_index = 0
                         st.session_state.wallet_address = address
                         st.success("✅ New wallet created!")
                         st.rerun()
@@ -64,8 +91,9 @@ def main():
                 if st.button("Import Wallet"):
                     if mnemonic_input.strip():
                         try:
-                            address = wallet_service.import_wallet(mnemonic_input.strip())
+                            address, account_index = wallet_service.import_wallet(mnemonic_input.strip())
                             st.session_state.mnemonic = mnemonic_input.strip()
+                            st.session_state.account_index = account_index
                             st.session_state.wallet_address = address
                             st.success("✅ Wallet imported successfully!")
                             st.rerun()
@@ -80,9 +108,13 @@ def main():
             st.code(st.session_state.wallet_address, language="text")
             
             if st.button("Disconnect Wallet"):
+                wallet_service.forget_signer(st.session_state.mnemonic)
                 st.session_state.wallet_address = None
                 st.session_state.mnemonic = None
                 st.session_state.pending_transaction = None
+                st.session_state.pending_payout = None
+                st.session_state.history_export = None
+                clear_history_cache()
                 st.rerun()
             
             # Show mnemonic (expandable)
@@ -108,7 +140,7 @@ def main():
         display_dashboard()
 
 def display_dashboard():
-    # Get wallet balance
+    # Get wallet balance (served from the write-through balance cache)
     balance = wallet_service.get_balance(st.session_state.wallet_address)
     
     # Balance display
@@ -117,7 +149,7 @@ def display_dashboard():
     with col1:
         st.metric("ETH Balance", f"{balance:.6f} ETH")
     with col2:
-        # Get ETH price in USD for display (optional)
+        # Get ETH price in USD for display (optional; served from WalletService's price cache)
         try:
             usd_value = wallet_service.get_eth_price_usd() * balance
             st.metric("USD Value", f"${usd_value:.2f}")
@@ -146,6 +178,10 @@ def display_send_transaction():
         display_transaction_approval()
         return
     
+    if st.session_state.pending_payout:
+        display_payout_approval()
+        return
+    
     with st.form("send_transaction_form"):
         # Recipient address
         recipient = st.text_input(
@@ -180,6 +216,63 @@ def display_send_transaction():
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error preparing transaction: {str(e)}")
+    
+    display_batch_payout()
+
+def display_batch_payout():
+    with st.expander("📦 Batch Payout"):
+        st.caption("Upload a CSV or JSONL file with address, amount and currency (ETH or USD) per leg.")
+        uploaded = st.file_uploader("Payout file:", type=["csv", "jsonl"])
+        
+        if uploaded and st.button("Prepare Batch Payout"):
+            try:
+                file_format = "jsonl" if uploaded.name.lower().endswith(".jsonl") else "csv"
+                legs = parse_payout_legs(uploaded.getvalue().decode("utf-8"), file_format)
+                st.session_state.pending_payout = wallet_service.prepare_batch_payout(
+                    st.session_state.wallet_address,
+                    legs
+                )
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error preparing batch payout: {str(e)}")
+
+def display_payout_approval():
+    st.subheader("🔐 Batch Payout Approval Required")
+    
+    payout = st.session_state.pending_payout
+    
+    st.info("Please review and approve this batch payout:")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Legs:**", len(payout['legs']))
+        st.write("**Merkle Root:**", payout['merkle_root'])
+    with col2:
+        st.write("**Total:**", f"{payout['total_eth']:.6f} ETH")
+        if payout.get('total_usd'):
+            st.write("**USD Legs:**", f"${payout['total_usd']:.2f}")
+    
+    st.code(payout['message'], language="text")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("✅ Approve & Sign Batch", type="primary"):
+            signature = wallet_service.sign_message(st.session_state.mnemonic, payout['message'],
+                                                    account_index=st.session_state.account_index)
+            result = wallet_service.execute_batch_payout(payout, signature)
+            st.session_state.pending_payout = None
+            
+            if result['success']:
+                clear_history_cache()
+                st.success(f"✅ Batch payout {result['batch_id']} completed: {result['leg_count']} transfers")
+            else:
+                st.error(f"Batch payout failed: {result['error']}")
+    
+    with col2:
+        if st.button("❌ Reject Batch"):
+            st.session_state.pending_payout = None
+            st.rerun()
 
 def display_transaction_approval():
     st.subheader("🔐 Transaction Approval Required")
@@ -206,11 +299,16 @@ def display_transaction_approval():
     
     with col1:
         if st.button("✅ Approve & Sign", type="primary"):
+            if transaction_time_left(tx_data) <= 0:
+                st.error("Transaction expired")
+                st.session_state.pending_transaction = None
+                st.rerun()
             try:
                 # Sign and execute transaction
                 signature = wallet_service.sign_message(
                     st.session_state.mnemonic,
-                    tx_data['message']
+                    tx_data['message'],
+                    account_index=st.session_state.account_index
                 )
                 
                 # Execute transaction
@@ -221,23 +319,14 @@ def display_transaction_approval():
                     signature,
                     tx_data['message'],
                     tx_data.get('original_usd_amount'),
-                    tx_data.get('original_eth_price')
+                    tx_data.get('original_eth_price'),
+                    notify=True
                 )
                 
                 if result['success']:
+                    clear_history_cache()
                     st.success("✅ Transaction completed successfully!")
                     
-                    # Send notification
-                    try:
-                        notification_service.send_transaction_notification(
-                            st.session_state.wallet_address,
-                            tx_data['to_address'],
-                            tx_data['amount_eth'],
-                            tx_data.get('amount_usd')
-                        )
-                    except Exception as e:
-                        st.warning(f"Transaction successful but notification failed: {str(e)}")
-                    
                     # Clear pending transaction
                     st.session_state.pending_transaction = None
                     time.sleep(2)
@@ -256,44 +345,154 @@ def display_transaction_approval():
             st.rerun()
     
     with col3:
-        # Show transaction expiry
-        created_time = tx_data.get('created_at', time.time())
-        time_left = max(0, 30 - (time.time() - created_time))
-        st.write(f"⏰ Expires in: {int(time_left)}s")
-        
-        if time_left <= 0:
-            st.error("Transaction expired")
-            st.session_state.pending_transaction = None
-            st.rerun()
+        display_expiry_countdown()
+
+@st.fragment(run_every=1)
+def display_expiry_countdown():
+    # Only this fragment re-runs each second; the dashboard above is not re-executed
+    tx_data = st.session_state.pending_transaction
+    if tx_data is None:
+        return
+    
+    time_left = transaction_time_left(tx_data)
+    st.write(f"⏰ Expires in: {int(time_left)}s")
+    
+    if time_left <= 0:
+        st.error("Transaction expired")
+        st.session_state.pending_transaction = None
+        st.rerun()
+
+def transaction_time_left(tx_data) -> float:
+    created_time = tx_data.get('created_at', time.time())
+    return max(0, TRANSACTION_TTL_SECONDS - (time.time() - created_time))
+
+def clear_history_cache():
+    st.session_state.history_cache = OrderedDict()
+
+def fetch_history_page(filters: tuple, before):
+    """One page of history (plus one row to detect a next page), cached per session"""
+    key = (filters, before)
+    cache = st.session_state.history_cache
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
     
-    # Auto-refresh every second to update the timer
-    time.sleep(1)
-    st.rerun()
+    address, direction, counterparty, since, until = filters
+    rows = wallet_service.get_transaction_history(
+        address, before=before, limit=HISTORY_PAGE_SIZE + 1,
+        direction=direction, counterparty=counterparty, since=since, until=until
+    )
+    page = (rows[:HISTORY_PAGE_SIZE], len(rows) > HISTORY_PAGE_SIZE)
+    cache[key] = page
+    while len(cache) > HISTORY_CACHE_PAGES:
+        cache.popitem(last=False)
+    return page
 
 def display_transaction_history():
     st.subheader("📊 Transaction History")
     
-    transactions = wallet_service.get_transaction_history(st.session_state.wallet_address)
+    address = st.session_state.wallet_address
     
-    if not transactions:
+    # Filters are applied in the database query, not on the rendered rows
+    col1, col2, col3 = st.columns([1, 2, 2])
+    with col1:
+        direction = st.radio("Show", ["All", "Sent", "Received"], horizontal=True, key="history_direction")
+    with col2:
+        dates = st.date_input("Date range", value=(), key="history_dates")
+    with col3:
+        counterparty = st.text_input("Counterparty", placeholder="0x...", key="history_counterparty").strip()
+    
+    if counterparty and not validate_ethereum_address(counterparty):
+        st.error("Invalid counterparty address")
+        return
+    since = dates[0].isoformat() if len(dates) > 0 else None
+    until = (dates[-1] + timedelta(days=1)).isoformat() if len(dates) > 0 else None
+    filters = (address, None if direction == "All" else direction.lower(), counterparty or None, since, until)
+    
+    # Changing a filter starts again from the newest page
+    if st.session_state.history_filters != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    transactions, has_next = fetch_history_page(filters, cursors[-1])
+    
+    if not transactions and len(cursors) == 1:
         st.info("No transactions found")
         return
     
-    # Display transactions in a table
-    for i, tx in enumerate(transactions):
-        with st.expander(f"Transaction #{len(transactions) - i} - {tx['timestamp'][:19]}"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Type:**", "Sent" if tx['from_address'] == st.session_state.wallet_address else "Received")
-                st.write("**From:**", tx['from_address'])
-                st.write("**To:**", tx['to_address'])
-            
-            with col2:
-                st.write("**Amount:**", f"{tx['amount']:.6f} ETH")
-                if tx['usd_amount']:
-                    st.write("**USD Value:**", f"${tx['usd_amount']:.2f}")
-                st.write("**Status:**", "✅ Confirmed")
+    # One table per page: render cost depends on the page size, not the ledger
+    st.dataframe(
+        [
+            {
+                "Time": tx['timestamp'][:19].replace("T", " "),
+                "Type": "Sent" if tx['from_address'] == address else "Received",
+                "Counterparty": tx['to_address'] if tx['from_address'] == address else tx['from_address'],
+                "Amount (ETH)": round(tx['amount'], 6),
+                "USD Value": round(tx['usd_amount'], 2) if tx['usd_amount'] else None,
+                "Status": "✅ Confirmed"
+            }
+            for tx in transactions
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 3])
+    with col1:
+        if st.button("← Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Older →", disabled=not has_next):
+            cursors.append(transactions[-1]['cursor'])
+            st.rerun()
+    with col3:
+        if st.button("🔄 Refresh"):
+            clear_history_cache()
+            st.rerun()
+    with col4:
+        st.caption(f"Page {len(cursors)}")
+    
+    display_history_export()
+
+def display_history_export():
+    with st.expander("⬇️ Export history"):
+        file_format = st.selectbox("Format", ["csv", "jsonl", "parquet"], key="export_format")
+        col1, col2 = st.columns(2)
+        with col1:
+            since = st.date_input("From", value=None, key="export_since")
+        with col2:
+            until = st.date_input("Until (inclusive)", value=None, key="export_until")
+        
+        if st.button("Prepare export"):
+            # Rows are streamed from the database; only the file itself is held for download
+            buffer = io.BytesIO()
+            out = buffer if file_format == "parquet" else io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+            try:
+                count = wallet_service.export_transaction_history(
+                    st.session_state.wallet_address,
+                    file_format,
+                    out,
+                    since=since.isoformat() if since else None,
+                    until=(until + timedelta(days=1)).isoformat() if until else None
+                )
+            except ValueError as e:
+                st.error(str(e))
+                return
+            if out is not buffer:
+                out.flush()
+                out.detach()
+            st.session_state.history_export = (file_format, buffer.getvalue(), count)
+        
+        if st.session_state.get('history_export'):
+            file_format, data, count = st.session_state.history_export
+            st.download_button(
+                f"Download {count} transactions",
+                data=data,
+                file_name=f"transactions_{st.session_state.wallet_address[:10]}.{file_format}",
+                mime="text/csv" if file_format == "csv" else "application/octet-stream"
+            )
 
 def display_settings():
     st.subheader("⚙️ Settings")
@@ -323,8 +522,18 @@ def display_settings():
     st.write("Balance:", f"{balance:.6f} ETH")
     
     # Database stats
-    total_transactions = len(wallet_service.get_transaction_history(st.session_state.wallet_address))
-    st.write("Total Transactions:", total_transactions)
+    stats = wallet_service.get_address_stats(st.session_state.wallet_address)
+    st.write("Total Transactions:", stats['tx_count'])
+    st.write("Total Sent:", f"{stats['total_sent']:.6f} ETH")
+    st.write("Total Received:", f"{stats['total_received']:.6f} ETH")
+    if stats['usd_volume']:
+        st.write("USD Volume:", f"${stats['usd_volume']:.2f}")
+    if stats['last_activity']:
+        st.write("Last Activity:", stats['last_activity'][:19])
+    
+    if db.balance_cache is not None:
+        cache_stats = db.balance_cache.stats()
+        st.write("Balance Cache Hit Rate:", f"{cache_stats['hit_rate']*100:.1f}% ({cache_stats['size']} cached)")
 
 if __name__ == "__main__":
     main()
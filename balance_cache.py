@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from metrics import metrics
+
+class BalanceCache:
+    """Bounded LRU of wallet balances by address, with optional expiry"""
+    
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        # Optional safety net for writes made outside this process
+        self.ttl = ttl
+        # address -> (balance, cached_at), least recently used first
+        self._balances: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every put/invalidate, so fill() can tell a write happened
+        self.generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        metrics.track_stats('balance_cache', self, gauges=('size',))
+    
+    def get(self, address: str) -> Optional[float]:
+        """Cached balance, or None on a miss"""
+        with self._lock:
+            entry = self._balances.get(address)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self._balances.move_to_end(address)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            return None
+    
+    def put(self, address: str, balance: float):
+        """Store a committed balance (write-through)"""
+        with self._lock:
+            self.generation += 1
+            self._store(address, balance)
+    
+    def fill(self, address: str, balance: float, generation: int) -> bool:
+        """Cache a balance read from the database, unless any write landed since
+        `generation` was read (the read might then be older than the cache)"""
+        with self._lock:
+            if self.generation != generation:
+                return False
+            self._store(address, balance)
+            return True
+    
+    def _store(self, address: str, balance: float):
+        self._balances[address] = (balance, time.monotonic())
+        self._balances.move_to_end(address)
+        while len(self._balances) > self.max_entries:
+            self._balances.popitem(last=False)
+            self._stats['evictions'] += 1
+    
+    def invalidate(self, address: str):
+        with self._lock:
+            self.generation += 1
+            if self._balances.pop(address, None) is not None:
+                self._stats['invalidations'] += 1
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._balances.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._balances)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from typing import Dict, List
+from eth_utils import keccak
+from merkle import build_tree, merkle_proof, merkle_root
+from utils import eth_to_wei, validate_ethereum_address
+
+CURRENCIES = ("ETH", "USD")
+
+def parse_payout_legs(content: str, file_format: str) -> List[Dict]:
+    """Parse payout legs from CSV or JSONL text with address, amount, currency fields"""
+    file_format = file_format.lower()
+    if file_format == 'csv':
+        records = list(csv.DictReader(io.StringIO(content)))
+    elif file_format == 'jsonl':
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    else:
+        raise ValueError("Payout file must be CSV or JSONL")
+    
+    if not records:
+        raise ValueError("Payout file contains no legs")
+    
+    legs = []
+    for line_number, record in enumerate(records, start=1):
+        address = str(record.get('address', '')).strip()
+        currency = str(record.get('currency', 'ETH')).strip().upper()
+        try:
+            amount = float(record.get('amount'))
+        except (TypeError, ValueError):
+            raise ValueError(f"Leg {line_number}: invalid amount")
+        
+        if not validate_ethereum_address(address):
+            raise ValueError(f"Leg {line_number}: invalid address {address!r}")
+        if amount <= 0:
+            raise ValueError(f"Leg {line_number}: amount must be positive")
+        if currency not in CURRENCIES:
+            raise ValueError(f"Leg {line_number}: currency must be ETH or USD")
+        
+        legs.append({'address': address, 'amount': amount, 'currency': currency})
+    return legs
+
+def leaf_hash(from_address: str, index: int, leg: Dict) -> bytes:
+    """Merkle leaf committing to one priced leg (amounts in wei / cents, so exact)"""
+    usd_cents = round(leg['amount_usd'] * 100) if leg.get('amount_usd') is not None else ''
+    encoded = f"{from_address.lower()}|{index}|{leg['to_address'].lower()}|" \
+              f"{eth_to_wei(leg['amount_eth'])}|{usd_cents}"
+    return keccak(text=encoded)
+
+def commit_legs(from_address: str, legs: List[Dict]) -> Dict:
+    """Merkle root (hex) over priced legs plus each leg's leaf hash and inclusion proof"""
+    leaves = [leaf_hash(from_address, i, leg) for i, leg in enumerate(legs)]
+    levels = build_tree(leaves)
+    return {
+        'merkle_root': '0x' + merkle_root(levels).hex(),
+        'leaves': ['0x' + leaf.hex() for leaf in leaves],
+        'proofs': [merkle_proof(levels, i) for i in range(len(legs))]
+    }
+
+def payout_message(from_address: str, leg_count: int, total_eth: float, root: str, nonce: str) -> str:
+    """The single message a batch payout is signed over (the nonce makes each signature single-use)"""
+    return (f"Batch payout of {leg_count} transfers totalling {total_eth:.6f} ETH "
+            f"from {from_address} with Merkle root {root} nonce {nonce}")
@@ -0,0 +1 @@
+"""Performance benchmarks for the Mock Web3 Wallet (run with python -m benchmarks.<name>)"""
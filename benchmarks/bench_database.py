@@ -0,0 +1,215 @@
+"""Compare DatabaseManager throughput with and without connection pooling"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import DatabaseManager
+
+class UnpooledDatabaseManager:
+    """Baseline: a fresh rollback-journal connection per call behind one global lock, as before pooling
+    
+    Standalone rather than a DatabaseManager subclass, so it cannot drift out of
+    step with DatabaseManager's internals. Implements only what run_workload uses.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        with self._connection() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS wallets (
+                    address TEXT PRIMARY KEY,
+                    balance REAL NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS transactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    from_address TEXT NOT NULL,
+                    to_address TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    usd_amount REAL,
+                    timestamp TEXT NOT NULL
+                )
+            ''')
+    
+    @contextmanager
+    def _connection(self):
+        """Open a connection, run the block in one transaction, commit and close"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            else:
+                cursor.execute('COMMIT')
+            finally:
+                conn.close()
+    
+    def create_wallet(self, address: str, initial_balance: float):
+        with self._connection() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO wallets (address, balance, created_at) VALUES (?, ?, ?)',
+                           (address, initial_balance, datetime.now().isoformat()))
+    
+    def get_wallet(self, address: str) -> Optional[Dict]:
+        with self._connection() as cursor:
+            cursor.execute('SELECT address, balance, created_at FROM wallets WHERE address = ?', (address,))
+            row = cursor.fetchone()
+        return {'address': row[0], 'balance': row[1], 'created_at': row[2]} if row else None
+    
+    def transfer_balance(self, from_address: str, to_address: str, amount: float):
+        with self._connection() as cursor:
+            cursor.execute('SELECT balance FROM wallets WHERE address = ?', (from_address,))
+            sender_row = cursor.fetchone()
+            if not sender_row:
+                raise ValueError("Sender wallet not found")
+            if sender_row[0] < amount:
+                raise ValueError("Insufficient balance")
+            cursor.execute('SELECT balance FROM wallets WHERE address = ?', (to_address,))
+            recipient_row = cursor.fetchone()
+            if recipient_row is None:
+                cursor.execute('INSERT INTO wallets (address, balance, created_at) VALUES (?, 0.0, ?)',
+                               (to_address, datetime.now().isoformat()))
+            cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?', (sender_row[0] - amount, from_address))
+            cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?',
+                           ((recipient_row[0] if recipient_row else 0.0) + amount, to_address))
+    
+    def add_transaction(self, from_address: str, to_address: str,
+                        amount: float, usd_amount: Optional[float] = None):
+        with self._connection() as cursor:
+            cursor.execute('''
+                INSERT INTO transactions (from_address, to_address, amount, usd_amount, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (from_address, to_address, amount, usd_amount, datetime.now().isoformat()))
+    
+    def get_transactions(self, address: str) -> List[Dict]:
+        with self._connection() as cursor:
+            cursor.execute('''
+                SELECT from_address, to_address, amount, usd_amount, timestamp
+                FROM transactions
+                WHERE from_address = ? OR to_address = ?
+                ORDER BY timestamp DESC
+                LIMIT 50
+            ''', (address, address))
+            rows = cursor.fetchall()
+        return [
+            {'from_address': row[0], 'to_address': row[1], 'amount': row[2],
+             'usd_amount': row[3], 'timestamp': row[4]}
+            for row in rows
+        ]
+
+def random_address() -> str:
+    return '0x' + os.urandom(20).hex()
+
+def run_workload(db: DatabaseManager, ops: int) -> float:
+    """Run a mixed create/get/transfer/history workload and return ops/sec"""
+    addresses = [random_address() for _ in range(100)]
+    for address in addresses:
+        db.create_wallet(address, 1_000_000.0)
+    
+    start = time.perf_counter()
+    for i in range(ops):
+        sender, recipient = random.sample(addresses, 2)
+        kind = i % 4
+        if kind == 0:
+            db.get_wallet(sender)
+        elif kind == 1:
+            db.transfer_balance(sender, recipient, 0.001)
+        elif kind == 2:
+            db.add_transaction(sender, recipient, 0.001)
+        else:
+            db.get_transactions(sender)
+    return ops / (time.perf_counter() - start)
+
+def run_transfer_commits(db: DatabaseManager, ops: int) -> Tuple[float, float]:
+    """Return transfers/sec for transfer_balance + add_transaction vs transfer_and_record"""
+    sender, recipient = random_address(), random_address()
+    db.create_wallet(sender, 1_000_000.0)
+    
+    start = time.perf_counter()
+    for _ in range(ops):
+        db.transfer_balance(sender, recipient, 0.001)
+        db.add_transaction(sender, recipient, 0.001)
+    two_commits = ops / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for _ in range(ops):
+        db.transfer_and_record(sender, recipient, 0.001)
+    single_commit = ops / (time.perf_counter() - start)
+    return two_commits, single_commit
+
+def run_concurrent_reads(db: DatabaseManager, readers: int, seconds: float) -> float:
+    """Measure get_wallet reads/sec from N threads while one thread keeps transferring"""
+    addresses = [random_address() for _ in range(100)]
+    for address in addresses:
+        db.create_wallet(address, 1_000_000.0)
+    
+    stop = threading.Event()
+    counts = [0] * readers
+    
+    def reader(slot: int):
+        while not stop.is_set():
+            db.get_wallet(random.choice(addresses))
+            counts[slot] += 1
+    
+    def writer():
+        while not stop.is_set():
+            sender, recipient = random.sample(addresses, 2)
+            db.transfer_balance(sender, recipient, 0.001)
+    
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=5000, help='operations per run')
+    parser.add_argument('--synchronous', default='NORMAL', help='PRAGMA synchronous for the pooled run')
+    parser.add_argument('--readers', type=int, nargs='*', default=[1, 2, 4, 8],
+                        help='reader thread counts for the concurrent read benchmark')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run_workload(UnpooledDatabaseManager(os.path.join(tmp, 'before.db')), args.ops)
+        pooled = DatabaseManager(os.path.join(tmp, 'after.db'), synchronous=args.synchronous)
+        after = run_workload(pooled, args.ops)
+        pooled.close()
+    
+    print(f"before (connect per call, rollback journal): {before:,.0f} ops/sec")
+    print(f"after  (pooled, WAL, synchronous={args.synchronous}):  {after:,.0f} ops/sec")
+    print(f"speedup: {after / before:.1f}x")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'commits.db'), synchronous='FULL')
+        two_commits, single_commit = run_transfer_commits(db, args.ops // 4)
+        db.close()
+    print(f"transfers, two commits (synchronous=FULL):  {two_commits:,.0f}/sec")
+    print(f"transfers, single commit (synchronous=FULL): {single_commit:,.0f}/sec")
+    
+    for readers in args.readers:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, 'reads.db'), synchronous=args.synchronous)
+            reads = run_concurrent_reads(db, readers, seconds=2.0)
+            db.close()
+        print(f"{readers} reader thread(s) + 1 writer: {reads:,.0f} balance reads/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare concurrent transfer throughput with and without group commit"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from database import DatabaseManager
+from benchmarks.bench_database import random_address
+
+def run_transfers(db: DatabaseManager, threads: int, transfers_per_thread: int) -> float:
+    """Drive transfer_and_record from N threads and return committed transfers/sec"""
+    addresses = [random_address() for _ in range(threads * 2)]
+    for address in addresses:
+        db.create_wallet(address, 1_000.0)
+    supply_before = sum(db.get_wallet(address)['balance'] for address in addresses)
+    
+    def worker():
+        for _ in range(transfers_per_thread):
+            sender, recipient = random.sample(addresses, 2)
+            db.transfer_and_record(sender, recipient, 0.001)
+    
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    supply_after = sum(db.get_wallet(address)['balance'] for address in addresses)
+    assert abs(supply_after - supply_before) < 1e-6, "total supply changed"
+    return threads * transfers_per_thread / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--transfers', type=int, default=100, help='transfers per thread')
+    parser.add_argument('--synchronous', default='FULL', help='PRAGMA synchronous (FULL fsyncs every commit)')
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--dir', default=None, help='directory for the database (use a real disk, not tmpfs)')
+    args = parser.parse_args()
+    
+    for group_commit in (False, True):
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            db = DatabaseManager(
+                os.path.join(tmp, 'bench.db'),
+                synchronous=args.synchronous,
+                group_commit=group_commit,
+                group_commit_window_ms=args.window_ms,
+                group_commit_max_batch=args.max_batch
+            )
+            rate = run_transfers(db, args.threads, args.transfers)
+            db.close()
+        label = 'group commit' if group_commit else 'commit per transfer'
+        print(f"{label:<20} {args.threads} threads: {rate:,.0f} transfers/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Measure bulk wallet provisioning throughput as derivation workers are added"""
+import argparse
+import os
+import tempfile
+import time
+
+from database import DatabaseManager
+from wallet_service import WalletService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200, help='wallets per run')
+    parser.add_argument('--workers', type=int, nargs='*', default=None,
+                        help='worker counts to try (default: 1, 2, 4, ... up to CPU count)')
+    args = parser.parse_args()
+    
+    worker_counts = args.workers
+    if not worker_counts:
+        worker_counts, n = [], 1
+        while n <= (os.cpu_count() or 1):
+            worker_counts.append(n)
+            n *= 2
+    
+    baseline = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+            wallet_service = WalletService(db)
+            start = time.perf_counter()
+            wallet_service.create_wallets(args.count, workers=workers)
+            rate = args.count / (time.perf_counter() - start)
+            db.close()
+        baseline = baseline or rate
+        print(f"{workers:>3} workers: {rate:,.0f} wallets/sec ({rate / baseline:.2f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Compare sign_message throughput with and without the signer cache"""
+import argparse
+import time
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from mnemonic import Mnemonic
+
+from signer_cache import SignerCache
+
+def signs_per_sec(sign, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        sign(f"Transfer {i} ETH")
+    return iterations / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    
+    Account.enable_unaudited_hdwallet_features()
+    mnemonic = Mnemonic("english").generate(strength=128)
+    cache = SignerCache()
+    
+    def sign_uncached(message: str) -> str:
+        account = Account.from_mnemonic(mnemonic)
+        return account.sign_message(encode_defunct(text=message)).signature.hex()
+    
+    def sign_cached(message: str) -> str:
+        account = cache.get(mnemonic)
+        return account.sign_message(encode_defunct(text=message)).signature.hex()
+    
+    uncached = signs_per_sec(sign_uncached, args.iterations)
+    cached = signs_per_sec(sign_cached, args.iterations)
+    print(f"without cache: {uncached:,.0f} signs/sec")
+    print(f"with cache:    {cached:,.0f} signs/sec ({cached / uncached:.1f}x)")
+    print(f"cache stats:   {cache.stats()}")
+
+if __name__ == '__main__':
+    main()
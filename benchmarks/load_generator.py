@@ -0,0 +1,245 @@
+"""Drive prepare -> sign -> execute from many concurrent wallets and check the ledger afterwards
+
+    python -m benchmarks.load_generator --wallets 100 --workers 16 --transactions 200
+    python -m benchmarks.load_generator --mode process --workers 4 --quotes stub --skip-latency lognormal:80:0.5
+
+Reports throughput, p50/p95/p99 per stage, time spent waiting for the write
+locks, and invariants: total supply conserved, every wallet's balance equal to
+its initial balance plus received minus sent, and one ledger row per success.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from mnemonic import Mnemonic
+
+from benchmarks.suite import percentile, stub_quote
+from database import DatabaseManager
+from metrics import metrics
+from quote_engine import QuoteEngine
+from stub_server import StubServer
+from wallet_service import WalletService
+
+STAGES = ('prepare', 'sign', 'execute', 'total')
+INITIAL_BALANCE = 1_000.0
+
+def build_service(db_path: str, quotes: str, group_commit: bool) -> WalletService:
+    db = DatabaseManager(db_path, group_commit=group_commit)
+    if quotes == 'fixed':
+        return WalletService(db, quote_engine=QuoteEngine(stub_quote))
+    # 'stub': real Skip/CoinGecko code paths against stub_server (SKIP_API_URL etc. set by main)
+    return WalletService(db)
+
+def run_worker(wallet_service: WalletService, mnemonic: str, addresses: List[str],
+               transactions: int, usd_ratio: float, seed: int) -> Dict:
+    """Run `transactions` prepare/sign/execute cycles between random wallets"""
+    rng = random.Random(seed)
+    latencies = {stage: [] for stage in STAGES}
+    outcomes = Counter()
+    for _ in range(transactions):
+        sender, recipient = rng.sample(range(len(addresses)), 2)
+        if rng.random() < usd_ratio:
+            currency, amount = 'USD', round(rng.uniform(1, 50), 2)
+        else:
+            currency, amount = 'ETH', round(rng.uniform(0.0001, 0.01), 6)
+        
+        t0 = time.perf_counter()
+        try:
+            tx = wallet_service.prepare_transaction(addresses[sender], addresses[recipient], amount, currency)
+        except ValueError as e:
+            outcomes[f"prepare: {e}"] += 1
+            continue
+        t1 = time.perf_counter()
+        signature = wallet_service.sign_message(mnemonic, tx['message'], account_index=sender)
+        t2 = time.perf_counter()
+        result = wallet_service.execute_transaction(
+            tx['from_address'], tx['to_address'], tx['amount_eth'], signature, tx['message'],
+            tx['original_usd_amount'], tx['original_eth_price']
+        )
+        t3 = time.perf_counter()
+        
+        if not result['success']:
+            outcomes[f"execute: {result['error']}"] += 1
+            continue
+        outcomes['success'] += 1
+        latencies['prepare'].append(t1 - t0)
+        latencies['sign'].append(t2 - t1)
+        latencies['execute'].append(t3 - t2)
+        latencies['total'].append(t3 - t0)
+    return {'latencies': latencies, 'outcomes': outcomes}
+
+def _process_worker(config: Dict) -> Dict:
+    """One worker process: its own services on the shared database file"""
+    wallet_service = build_service(config['db_path'], config['quotes'], config['group_commit'])
+    # Warm the signer cache so key derivation is not timed as signing
+    wallet_service.derive_accounts(config['mnemonic'], len(config['addresses']))
+    result = run_worker(wallet_service, config['mnemonic'], config['addresses'],
+                        config['transactions'], config['usd_ratio'], config['seed'])
+    result['lock_stats'] = wallet_service.db.lock_stats()
+    wallet_service.db.close()
+    return result
+
+def check_invariants(db: DatabaseManager, addresses: List[str], successes: int) -> Dict:
+    """Supply conservation, per-wallet ledger balance and ledger row count"""
+    wallets = {}
+    for i in range(0, len(addresses), 500):
+        wallets.update(db.get_wallets(addresses[i:i + 500]))
+    stats = [db.get_address_stats(address) for address in addresses]
+    
+    supply_before = INITIAL_BALANCE * len(addresses)
+    supply_after = sum(wallet['balance'] for wallet in wallets.values())
+    unbalanced = [
+        s['address'] for s in stats
+        if abs(INITIAL_BALANCE + s['total_received'] - s['total_sent'] - wallets[s['address']]['balance']) > 1e-6
+    ]
+    # Each transfer is counted once for its sender and once for its recipient
+    ledger_rows = sum(s['tx_count'] for s in stats) // 2
+    tolerance = 1e-9 * supply_before
+    
+    return {
+        'supply_before': supply_before,
+        'supply_after': supply_after,
+        'supply_conserved': abs(supply_after - supply_before) <= tolerance,
+        'negative_balances': sum(1 for wallet in wallets.values() if wallet['balance'] < 0),
+        'unbalanced_wallets': len(unbalanced),
+        'ledger_rows': ledger_rows,
+        'ledger_matches_successes': ledger_rows == successes
+    }
+
+def summarise(results: List[Dict], elapsed: float) -> Dict:
+    latencies = {stage: [] for stage in STAGES}
+    outcomes = Counter()
+    for result in results:
+        for stage in STAGES:
+            latencies[stage].extend(result['latencies'][stage])
+        outcomes.update(result['outcomes'])
+    
+    stages = {}
+    for stage, values in latencies.items():
+        values.sort()
+        stages[stage] = {
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'mean_ms': sum(values) / len(values) * 1000 if values else 0.0
+        }
+    return {
+        'elapsed_seconds': elapsed,
+        'successes': outcomes['success'],
+        'transfers_per_sec': outcomes['success'] / elapsed if elapsed else 0.0,
+        'outcomes': dict(outcomes),
+        'stages': stages
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wallets', type=int, default=50, help='number of wallets (K)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent threads or processes')
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--transactions', type=int, default=100, help='transactions per worker')
+    parser.add_argument('--usd-ratio', type=float, default=0.5, help='fraction of transfers priced in USD')
+    parser.add_argument('--quotes', choices=('fixed', 'stub'), default='fixed',
+                        help='fixed-price quote stub, or the real HTTP paths against stub_server')
+    parser.add_argument('--skip-latency', default='fixed:0', help='stub Skip latency spec (with --quotes stub)')
+    parser.add_argument('--volatility', type=float, default=0.0, help='stub price drift (with --quotes stub)')
+    parser.add_argument('--group-commit', action='store_true', help='enable DatabaseManager group commit')
+    parser.add_argument('--db', help='database file (default: a temporary file)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics while running (thread mode)')
+    args = parser.parse_args()
+    
+    if args.metrics_port:
+        metrics.enable()
+        metrics.serve(args.metrics_port)
+    
+    stub = None
+    if args.quotes == 'stub':
+        stub = StubServer(latency={'skip': args.skip_latency}, volatility=args.volatility,
+                          seed=args.seed).start()
+        # Inherited by worker processes too
+        os.environ.update(stub.env())
+    
+    tmp = tempfile.TemporaryDirectory()
+    db_path = args.db or os.path.join(tmp.name, 'load.db')
+    wallet_service = build_service(db_path, args.quotes, args.group_commit)
+    
+    # All wallets are accounts of one mnemonic: one seed computation, fast signing
+    mnemonic = Mnemonic("english").generate(strength=128)
+    addresses = [account['address'] for account in wallet_service.derive_accounts(mnemonic, args.wallets)]
+    wallet_service.db.create_wallets((address, INITIAL_BALANCE) for address in addresses)
+    print(f"created {len(addresses)} wallets; running {args.workers} {args.mode} workers "
+          f"x {args.transactions} transactions ({args.usd_ratio:.0%} USD, {args.quotes} quotes)")
+    
+    start = time.perf_counter()
+    if args.mode == 'thread':
+        results = [None] * args.workers
+        
+        def thread_worker(slot: int):
+            results[slot] = run_worker(wallet_service, mnemonic, addresses, args.transactions,
+                                       args.usd_ratio, args.seed + slot)
+        
+        threads = [threading.Thread(target=thread_worker, args=(i,)) for i in range(args.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lock_stats = [wallet_service.db.lock_stats()]
+    else:
+        configs = [{
+            'db_path': db_path, 'quotes': args.quotes, 'group_commit': args.group_commit,
+            'mnemonic': mnemonic, 'addresses': addresses, 'transactions': args.transactions,
+            'usd_ratio': args.usd_ratio, 'seed': args.seed + i
+        } for i in range(args.workers)]
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_process_worker, configs))
+        lock_stats = [result['lock_stats'] for result in results]
+    elapsed = time.perf_counter() - start
+    
+    report = summarise(results, elapsed)
+    report['lock_wait'] = {
+        'write_transactions': sum(s['write_transactions'] for s in lock_stats),
+        'write_lock_wait_seconds': sum(s['write_lock_wait'] for s in lock_stats),
+        'begin_wait_seconds': sum(s['begin_wait'] for s in lock_stats),
+        'max_wait_ms': max(s['max_wait'] for s in lock_stats) * 1000
+    }
+    wallet_service.db.invalidate_balances()
+    report['invariants'] = check_invariants(wallet_service.db, addresses, report['successes'])
+    report['config'] = vars(args)
+    wallet_service.db.close()
+    if stub is not None:
+        stub.stop()
+    tmp.cleanup()
+    
+    print(f"\n{report['successes']} transfers in {elapsed:.2f}s: {report['transfers_per_sec']:,.0f} transfers/sec")
+    for stage, s in report['stages'].items():
+        print(f"  {stage:<8} p50 {s['p50_ms']:8.2f} ms  p95 {s['p95_ms']:8.2f} ms  p99 {s['p99_ms']:8.2f} ms")
+    lock_wait = report['lock_wait']
+    print(f"  lock wait: {lock_wait['write_lock_wait_seconds']:.3f}s in-process, "
+          f"{lock_wait['begin_wait_seconds']:.3f}s SQLite, max {lock_wait['max_wait_ms']:.2f} ms "
+          f"over {lock_wait['write_transactions']} write transactions")
+    failures = {k: v for k, v in report['outcomes'].items() if k != 'success'}
+    if failures:
+        print(f"  failures: {failures}")
+    
+    invariants = report['invariants']
+    ok = (invariants['supply_conserved'] and not invariants['negative_balances']
+          and not invariants['unbalanced_wallets'] and invariants['ledger_matches_successes'])
+    print(f"invariants {'OK' if ok else 'VIOLATED'}: {json.dumps(invariants)}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
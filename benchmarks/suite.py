@@ -0,0 +1,290 @@
+"""Reproducible, offline benchmark suite for the database, wallet and notification hot paths
+
+Writes JSON results (one record per benchmark with ops/sec and p50/p95/p99
+latencies) so runs from different commits can be compared:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from mnemonic import Mnemonic
+
+from database import DatabaseManager
+from http_client import HttpClient
+from notification_service import NotificationService
+from quote_engine import QuoteEngine
+from signature_verifier import SignatureVerifier
+from stub_server import StubServer
+from wallet_service import WalletService
+
+STUB_ETH_PRICE = 3000.0
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def measure(group: str, name: str, fn: Callable[[int], object], iterations: int,
+            **params) -> Dict:
+    """Call fn(i) `iterations` times and summarise throughput and latency"""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        'group': group,
+        'name': name,
+        'params': params,
+        'iterations': iterations,
+        'seconds': elapsed,
+        'ops_per_sec': iterations / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+    report(result)
+    return result
+
+def report(result: Dict):
+    """Print one benchmark's summary line"""
+    print(f"{result['group']:<13} {result['name']:<28} {json.dumps(result['params']):<18} "
+          f"{result['ops_per_sec']:>12,.0f} ops/sec  p99 {result['p99_ms']:.3f} ms")
+
+def random_address() -> str:
+    return '0x' + os.urandom(20).hex()
+
+def seed_ledger(db: DatabaseManager, rows: int, addresses: List[str]) -> Dict:
+    """Bulk load `rows` historical transfers between `addresses`, newest last"""
+    base = datetime(2024, 1, 1)
+    
+    def transactions():
+        for i in range(rows):
+            sender, recipient = random.sample(addresses, 2)
+            yield sender, recipient, 0.001, 3.0, (base + timedelta(seconds=i)).isoformat()
+    
+    start = time.perf_counter()
+    # The ledger starts empty, so rebuilding the indexes once is cheapest
+    db.import_transactions(transactions(), defer_indexes=True)
+    
+    elapsed = time.perf_counter() - start
+    print(f"{'database':<13} {'seed_transactions':<28} {json.dumps({'rows': rows}):<18} "
+          f"{rows / elapsed:>12,.0f} rows/sec")
+    return {
+        'group': 'database',
+        'name': 'seed_transactions',
+        'params': {'rows': rows},
+        'iterations': rows,
+        'seconds': elapsed,
+        'ops_per_sec': rows / elapsed
+    }
+
+def bench_database(tmp: str, sizes: List[int], iterations: int) -> List[Dict]:
+    """create / get / transfer / history against ledgers of each size"""
+    results = []
+    for size in sizes:
+        db = DatabaseManager(os.path.join(tmp, f'ledger_{size}.db'))
+        addresses = [random_address() for _ in range(1000)]
+        db.create_wallets((address, 1_000_000.0) for address in addresses)
+        results.append(seed_ledger(db, size, addresses))
+        hot = addresses[0]
+        
+        results.append(measure('database', 'create_wallet',
+                               lambda i: db.create_wallet(random_address(), 1.0),
+                               iterations, rows=size))
+        results.append(measure('database', 'get_balance',
+                               lambda i: db.get_balance(addresses[i % len(addresses)]),
+                               iterations, rows=size))
+        results.append(measure('database', 'get_wallet',
+                               lambda i: db.get_wallet(addresses[i % len(addresses)]),
+                               iterations, rows=size))
+        results.append(measure('database', 'transfer_and_record',
+                               lambda i: db.transfer_and_record(*random.sample(addresses, 2), 0.001),
+                               iterations, rows=size))
+        results.append(measure('database', 'history_first_page',
+                               lambda i: db.get_transactions(addresses[i % len(addresses)]),
+                               iterations, rows=size))
+        
+        # Walk one address's history page by page via the keyset cursor
+        cursor = {'before': None}
+        
+        def next_page(i):
+            page = db.get_transactions(hot, before=cursor['before'])
+            cursor['before'] = page[-1]['cursor'] if len(page) == 50 else None
+        
+        results.append(measure('database', 'history_next_page', next_page, iterations, rows=size))
+        db.close()
+    return results
+
+def stub_quote(usd_amount: float) -> Dict:
+    """Skip-shaped quote at a fixed price, so no network is needed"""
+    return {
+        'success': True,
+        'eth_amount': usd_amount / STUB_ETH_PRICE,
+        'usd_amount': usd_amount,
+        'rate': STUB_ETH_PRICE
+    }
+
+def bench_wallet_service(tmp: str, iterations: int) -> List[Dict]:
+    """create / import / sign / verify / prepare / execute with stubbed quotes"""
+    results = []
+    db = DatabaseManager(os.path.join(tmp, 'wallet_service.db'))
+    verifier = SignatureVerifier()
+    wallet_service = WalletService(db, quote_engine=QuoteEngine(stub_quote),
+                                   signature_verifier=verifier)
+    
+    # Key derivation (PBKDF2) dominates these, so they get fewer iterations
+    derivations = max(10, iterations // 20)
+    created = []
+    results.append(measure('wallet_service', 'create_wallet',
+                           lambda i: created.append(wallet_service.create_wallet()), derivations))
+    
+    mnemonics = [Mnemonic("english").generate(strength=128) for _ in range(derivations)]
+    results.append(measure('wallet_service', 'import_wallet',
+                           lambda i: wallet_service.import_wallet(mnemonics[i]), derivations))
+    
+    mnemonic, address = created[0]
+    db.update_balance(address, 1_000_000.0)
+    recipient = created[1][1] if len(created) > 1 else random_address()
+    
+    results.append(measure('wallet_service', 'sign_message',
+                           lambda i: wallet_service.sign_message(mnemonic, f"message {i}"), iterations))
+    
+    signed = [(f"message {i}", wallet_service.sign_message(mnemonic, f"message {i}"))
+              for i in range(iterations)]
+    results.append(measure('wallet_service', 'verify_signature',
+                           lambda i: wallet_service.verify_signature(address, *signed[i]), iterations,
+                           cache='cold'))
+    results.append(measure('wallet_service', 'verify_signature',
+                           lambda i: wallet_service.verify_signature(address, *signed[i]), iterations,
+                           cache='warm'))
+    
+    results.append(measure('wallet_service', 'prepare_transaction',
+                           lambda i: wallet_service.prepare_transaction(address, recipient, 10.0, "USD"),
+                           iterations, currency='USD'))
+    
+    # Sign outside the timed region: execute is measured on its own
+    prepared = []
+    for i in range(iterations):
+        tx = wallet_service.prepare_transaction(address, recipient, 10.0 + i / 1000, "USD")
+        prepared.append((tx, wallet_service.sign_message(mnemonic, tx['message'])))
+    
+    def execute(i):
+        tx, signature = prepared[i]
+        result = wallet_service.execute_transaction(
+            tx['from_address'], tx['to_address'], tx['amount_eth'], signature, tx['message'],
+            tx['original_usd_amount'], tx['original_eth_price']
+        )
+        if not result['success']:
+            raise RuntimeError(result['error'])
+    
+    results.append(measure('wallet_service', 'execute_transaction', execute, iterations,
+                           currency='USD'))
+    verifier.close()
+    db.close()
+    return results
+
+def bench_notifications(iterations: int) -> List[Dict]:
+    """send_transaction_notification against stub_server.StubServer"""
+    stub = StubServer().start()
+    http = HttpClient(retries=0)
+    try:
+        notification_service = NotificationService(http_client=http)
+        notification_service.base_url = stub.env()['RESEND_API_URL']
+        
+        def send(i):
+            if not notification_service.send_transaction_notification(
+                    random_address(), random_address(), 0.5, 1500.0):
+                raise RuntimeError("stub notification failed")
+        
+        # NotificationService prints a line per email; keep that out of the
+        # output and out of the measured latency
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = measure('notification', 'send_transaction_notification', send, iterations)
+        report(result)
+        return [result]
+    finally:
+        http.close()
+        stub.stop()
+
+def environment() -> Dict:
+    """Commit and platform details recorded alongside the numbers"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def result_key(result: Dict) -> str:
+    return f"{result['group']}.{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+def compare(results: List[Dict], baseline_path: str):
+    """Print the throughput ratio of each benchmark against a previous run"""
+    with open(baseline_path) as f:
+        baseline = {result_key(result): result for result in json.load(f)['results']}
+    print(f"\ncompared with {baseline_path}:")
+    for result in results:
+        before: Optional[Dict] = baseline.get(result_key(result))
+        if before and before['ops_per_sec']:
+            ratio = result['ops_per_sec'] / before['ops_per_sec']
+            print(f"  {result_key(result):<60} {ratio:6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1_000, 10_000, 100_000],
+                        help='ledger sizes for the database benchmarks (up to 10000000)')
+    parser.add_argument('--iterations', type=int, default=1000, help='operations per benchmark')
+    parser.add_argument('--only', choices=('database', 'wallet_service', 'notification'), nargs='*',
+                        help='run only these groups')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', help='write JSON results here')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+    
+    random.seed(args.seed)
+    groups = set(args.only or ('database', 'wallet_service', 'notification'))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if 'database' in groups:
+            results += bench_database(tmp, args.sizes, args.iterations)
+        if 'wallet_service' in groups:
+            results += bench_wallet_service(tmp, args.iterations)
+    if 'notification' in groups:
+        results += bench_notifications(args.iterations)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"\nwrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import getpass
+import json
+import os
+import sys
+import time
+from database import DatabaseManager
+from batch_payout import parse_payout_legs
+from ledger_export import EXPORT_FORMATS, export_transactions
+from ledger_import import IMPORT_TABLES, read_transaction_rows, read_wallet_rows
+from wallet_service import WalletService
+
+def cmd_provision(args):
+    """Create wallets in bulk and report throughput"""
+    wallet_service = WalletService(DatabaseManager(args.db))
+    
+    start = time.perf_counter()
+    wallets = wallet_service.create_wallets(args.count, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    
+    if args.output:
+        # Mnemonics are secrets: only written when explicitly asked for
+        with open(args.output, 'w') as f:
+            for mnemonic, address in wallets:
+                f.write(json.dumps({'address': address, 'mnemonic': mnemonic}) + '\n')
+    
+    workers = args.workers or os.cpu_count()
+    print(f"Created {len(wallets)} wallets in {elapsed:.2f}s "
+          f"({len(wallets) / elapsed:,.0f} wallets/sec, {workers} workers)")
+
+def cmd_payout(args):
+    """Pay every leg of a CSV/JSONL file with one signature"""
+    wallet_service = WalletService(DatabaseManager(args.db))
+    
+    with open(args.file) as f:
+        file_format = 'jsonl' if args.file.lower().endswith(('.jsonl', '.json')) else 'csv'
+        legs = parse_payout_legs(f.read(), file_format)
+    
+    payout = wallet_service.prepare_batch_payout(args.from_address, legs)
+    print(payout['message'])
+    
+    mnemonic = os.getenv('WALLET_MNEMONIC') or getpass.getpass("Mnemonic phrase: ")
+    signature = wallet_service.sign_message(mnemonic, payout['message'], account_index=args.account_index)
+    
+    start = time.perf_counter()
+    result = wallet_service.execute_batch_payout(payout, signature)
+    elapsed = time.perf_counter() - start
+    
+    if not result['success']:
+        print(f"Batch payout failed: {result['error']}")
+        sys.exit(1)
+    print(f"Batch {result['batch_id']}: {result['leg_count']} legs applied in {elapsed:.2f}s "
+          f"({result['leg_count'] / elapsed:,.0f} legs/sec)")
+
+def cmd_rebuild_stats(args):
+    """Recompute per-address ledger statistics from the transactions table"""
+    db = DatabaseManager(args.db)
+    start = time.perf_counter()
+    addresses = db.rebuild_address_stats()
+    print(f"Rebuilt stats for {addresses} addresses in {time.perf_counter() - start:.2f}s")
+
+def cmd_export(args):
+    """Stream transactions to a CSV/JSONL/Parquet/Arrow file"""
+    db = DatabaseManager(args.db)
+    binary = args.format in ('parquet', 'arrow')
+    if args.output:
+        out = open(args.output, 'wb' if binary else 'w', newline='' if not binary else None)
+    elif binary:
+        out = sys.stdout.buffer
+    else:
+        out = sys.stdout
+    
+    start = time.perf_counter()
+    try:
+        rows = db.iter_transactions(address=args.address, since=args.since, until=args.until)
+        count = export_transactions(rows, args.format, out)
+    except ValueError as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Exported {count} transactions in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+def cmd_import(args):
+    """Bulk load wallets or historical transactions from CSV/JSONL and report throughput"""
+    db = DatabaseManager(args.db)
+    file_format = args.format or ('jsonl' if args.file.lower().endswith(('.jsonl', '.json')) else 'csv')
+    
+    start = time.perf_counter()
+    try:
+        with open(args.file, newline='') as f:
+            if args.table == 'wallets':
+                count = db.import_wallets(read_wallet_rows(f, file_format, args.chunk_size),
+                                          chunk_size=args.chunk_size)
+            else:
+                count = db.import_transactions(read_transaction_rows(f, file_format, args.chunk_size),
+                                               chunk_size=args.chunk_size,
+                                               defer_indexes=args.defer_indexes)
+    except ValueError as e:
+        # The import runs in one transaction, so nothing was written
+        print(f"Import failed: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {count} {args.table} in {elapsed:.2f}s ({count / elapsed:,.0f} rows/sec)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Mock Web3 Wallet command line tools")
+    parser.add_argument('--db', default='wallet.db', help='SQLite database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    provision = subparsers.add_parser('provision', help='create wallets in bulk')
+    provision.add_argument('count', type=int, help='number of wallets to create')
+    provision.add_argument('--workers', type=int, default=None, help='derivation processes (default: CPU count)')
+    provision.add_argument('--output', help='write address/mnemonic pairs to this JSONL file')
+    provision.set_defaults(func=cmd_provision)
+    
+    payout = subparsers.add_parser('payout', help='pay a CSV/JSONL file of legs with one signature')
+    payout.add_argument('file', help='CSV or JSONL with address, amount, currency')
+    payout.add_argument('--from', dest='from_address', required=True, help='paying wallet address')
+    payout.add_argument('--account-index', type=int, default=0,
+                        help="HD account index of the paying wallet (m/44'/60'/0'/0/N)")
+    payout.set_defaults(func=cmd_payout)
+    
+    rebuild_stats = subparsers.add_parser('rebuild-stats', help='recompute per-address ledger statistics')
+    rebuild_stats.set_defaults(func=cmd_rebuild_stats)
+    
+    export = subparsers.add_parser('export', help='stream transactions to a file')
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help='output format (parquet/arrow need pyarrow)')
+    export.add_argument('--address', help='only transactions sent or received by this address')
+    export.add_argument('--since', help='ISO timestamp, inclusive')
+    export.add_argument('--until', help='ISO timestamp, exclusive')
+    export.add_argument('--output', help='output file (default: stdout)')
+    export.set_defaults(func=cmd_export)
+    
+    ledger_import = subparsers.add_parser('import', help='bulk load wallets or transactions')
+    ledger_import.add_argument('table', choices=IMPORT_TABLES, help='table to load')
+    ledger_import.add_argument('file', help='CSV or JSONL input')
+    ledger_import.add_argument('--format', choices=('csv', 'jsonl'), help='input format (default: from extension)')
+    ledger_import.add_argument('--chunk-size', type=int, default=5000, help='rows per executemany batch')
+    ledger_import.add_argument('--defer-indexes', action='store_true',
+                               help='drop transaction indexes and rebuild them after loading '
+                                    '(faster only when the file is large compared with the ledger)')
+    ledger_import.set_defaults(func=cmd_import)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
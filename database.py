@@ -1,21 +1,326 @@
 import sqlite3
 import os
+import heapq
+import itertools
+import json
+import queue
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import threading
+import weakref
+from balance_cache import BalanceCache
+from metrics import instrument, metrics
 
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORE_MODES = ("DEFAULT", "FILE", "MEMORY")
+
+# Recompute address_stats from the transactions table (self-transfers count once)
+REBUILD_ADDRESS_STATS = [
+    'DELETE FROM address_stats',
+    '''
+    INSERT INTO address_stats (address, tx_count, total_sent, total_received, usd_volume,
+                               first_activity, last_activity)
+    SELECT address, COUNT(*), SUM(sent), SUM(received), SUM(usd), MIN(timestamp), MAX(timestamp)
+    FROM (
+        SELECT from_address AS address, amount AS sent,
+               CASE WHEN to_address = from_address THEN amount ELSE 0 END AS received,
+               COALESCE(usd_amount, 0) AS usd, timestamp
+        FROM transactions
+        UNION ALL
+        SELECT to_address, 0, amount, COALESCE(usd_amount, 0), timestamp
+        FROM transactions
+        WHERE to_address != from_address
+    )
+    GROUP BY address
+    ''',
+]
+
+# Add (address, tx_count, sent, received, usd_volume, first, last) deltas to address_stats
+UPSERT_ADDRESS_STATS = '''
+    INSERT INTO address_stats (address, tx_count, total_sent, total_received, usd_volume,
+                               first_activity, last_activity)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (address) DO UPDATE SET
+        tx_count = tx_count + excluded.tx_count,
+        total_sent = total_sent + excluded.total_sent,
+        total_received = total_received + excluded.total_received,
+        usd_volume = usd_volume + excluded.usd_volume,
+        first_activity = MIN(first_activity, excluded.first_activity),
+        last_activity = MAX(last_activity, excluded.last_activity)
+'''
+
+# Secondary indexes on transactions; large bulk imports can drop and rebuild them
+TRANSACTION_INDEXES = {
+    'idx_transactions_from_timestamp':
+        'CREATE INDEX IF NOT EXISTS idx_transactions_from_timestamp ON transactions (from_address, timestamp)',
+    'idx_transactions_to_timestamp':
+        'CREATE INDEX IF NOT EXISTS idx_transactions_to_timestamp ON transactions (to_address, timestamp)',
+}
+
+# Schema migrations, applied in order by init_database and tracked in PRAGMA user_version
+MIGRATIONS = [
+    # 1: secondary indexes for per-address, newest-first history scans
+    list(TRANSACTION_INDEXES.values()),
+    # 2: durable notification outbox, written in the same commit as the transfer
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_outbox_status_next_attempt ON notification_outbox (status, next_attempt_at)',
+    ],
+    # 3: batch payouts signed once over a Merkle root, with per-leg proofs for audit
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS payout_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_address TEXT NOT NULL,
+            merkle_root TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            leg_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS payout_legs (
+            batch_id INTEGER NOT NULL,
+            leg_index INTEGER NOT NULL,
+            tx_id INTEGER NOT NULL,
+            leaf_hash TEXT NOT NULL,
+            proof TEXT NOT NULL,
+            PRIMARY KEY (batch_id, leg_index),
+            FOREIGN KEY (batch_id) REFERENCES payout_batches (id),
+            FOREIGN KEY (tx_id) REFERENCES transactions (id)
+        )
+        ''',
+    ],
+    # 4: per-address ledger statistics, maintained inside every transfer transaction
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS address_stats (
+            address TEXT PRIMARY KEY,
+            tx_count INTEGER NOT NULL,
+            total_sent REAL NOT NULL,
+            total_received REAL NOT NULL,
+            usd_volume REAL NOT NULL,
+            first_activity TEXT NOT NULL,
+            last_activity TEXT NOT NULL
+        )
+        ''',
+        *REBUILD_ADDRESS_STATS,
+    ],
+    # 5: single-use payout nonces, so a signed batch cannot be replayed
+    [
+        'ALTER TABLE payout_batches ADD COLUMN nonce TEXT',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_payout_batches_from_nonce ON payout_batches (from_address, nonce)',
+    ],
+]
+
+@instrument("database")
 class DatabaseManager:
-    def __init__(self, db_path: str = "wallet.db"):
+    def __init__(self, db_path: str = "wallet.db", synchronous: str = "NORMAL",
+                 cache_size_kb: int = 8192, busy_timeout_ms: int = 5000, temp_store: str = "MEMORY",
+                 group_commit: bool = False, group_commit_window_ms: float = 2.0,
+                 group_commit_max_batch: int = 64,
+                 balance_cache_size: int = 10000, balance_cache_ttl: Optional[float] = None,
+                 external_write_check_interval: float = 0.05):
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_MODES)}")
+        if temp_store.upper() not in TEMP_STORE_MODES:
+            raise ValueError(f"temp_store must be one of {', '.join(TEMP_STORE_MODES)}")
+        
         self.db_path = db_path
-        self.lock = threading.Lock()
+        self.synchronous = synchronous.upper()
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.temp_store = temp_store.upper()
+        
+        # Single writer path: one connection, serialized by write_lock
+        self.write_lock = threading.Lock()
+        self._writer = self._connect()
+        # Seconds spent waiting for write_lock (this process) and for SQLite's
+        # write lock in BEGIN IMMEDIATE (other processes); updated under write_lock
+        self._lock_stats = {'write_transactions': 0, 'write_lock_wait': 0.0,
+                            'begin_wait': 0.0, 'max_wait': 0.0}
+        metrics.track_database(self)
+        
+        # Write-through balance cache. Writes stage their new balances here and
+        # they are applied after COMMIT while write_lock is still held, so the
+        # cache follows commit order. Commits from other connections or
+        # processes change the writer's PRAGMA data_version (our own do not),
+        # which clears the cache. Every write transaction checks it; reads check
+        # at most once per external_write_check_interval seconds (0: every read).
+        self.balance_cache = BalanceCache(balance_cache_size, balance_cache_ttl) if balance_cache_size > 0 else None
+        self._staged_balances: Dict[str, Optional[float]] = {}
+        self.external_write_check_interval = external_write_check_interval
+        self._data_version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+        self._next_external_check = 0.0
+        
+        # Reader pool: one long-lived read-only connection per thread
+        self._local = threading.local()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        
         self.init_database()
+        
+        # Group commit (opt-in): transfer_and_record calls are queued and a
+        # single committer thread applies them in batches, one commit per batch
+        self.group_commit = group_commit
+        self.group_commit_window_ms = group_commit_window_ms
+        self.group_commit_max_batch = group_commit_max_batch
+        self._commit_queue = queue.Queue()
+        self._committer = None
+        if group_commit:
+            self._committer = threading.Thread(
+                target=self._group_commit_loop, name="DatabaseManager-group-commit", daemon=True
+            )
+            self._committer.start()
+    
+    def _connect(self, read_only: bool = False, temp_store: Optional[str] = None) -> sqlite3.Connection:
+        """Open a new connection with the configured pragmas (temp_store overrides the default)"""
+        if read_only:
+            database, uri = Path(self.db_path).resolve().as_uri() + '?mode=ro', True
+        else:
+            database, uri = self.db_path, False
+        
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves
+        conn = sqlite3.connect(
+            database,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            uri=uri
+        )
+        if not read_only:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        # Negative cache_size is in KiB rather than pages
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA temp_store={temp_store or self.temp_store}')
+        return conn
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the calling thread's pooled read-only connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.add(conn)
+            # Close the connection once its owning thread has exited
+            weakref.finalize(threading.current_thread(), self._release_connection,
+                             self._connections, self._connections_lock, conn)
+        return conn
+    
+    @staticmethod
+    def _release_connection(connections: set, connections_lock: threading.Lock,
+                            conn: sqlite3.Connection):
+        """Remove a connection from the pool and close it"""
+        with connections_lock:
+            if conn not in connections:
+                return
+            connections.discard(conn)
+        conn.close()
+    
+    @contextmanager
+    def _write_transaction(self):
+        """Run a block on the writer connection inside BEGIN IMMEDIATE ... COMMIT"""
+        requested = time.perf_counter()
+        with self.write_lock:
+            acquired = time.perf_counter()
+            cursor = self._writer.cursor()
+            # IMMEDIATE takes SQLite's write lock up front, so a writer in another
+            # process makes us wait here instead of failing mid-transaction
+            cursor.execute('BEGIN IMMEDIATE')
+            begun = time.perf_counter()
+            # Nobody else can commit now; drop balances another process changed
+            self._check_external_writes()
+            stats = self._lock_stats
+            stats['write_transactions'] += 1
+            stats['write_lock_wait'] += acquired - requested
+            stats['begin_wait'] += begun - acquired
+            stats['max_wait'] = max(stats['max_wait'], begun - requested)
+            self._staged_balances = {}
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                self._staged_balances = {}
+                raise
+            cursor.execute('COMMIT')
+            self._apply_staged_balances()
+    
+    def lock_stats(self) -> Dict:
+        """Write transaction count and total/max seconds spent waiting for the write locks"""
+        return dict(self._lock_stats)
+    
+    def _stage_balance(self, address: str, balance: Optional[float]):
+        """Record a balance written by the open transaction (None: unknown, invalidate)"""
+        self._staged_balances[address] = balance
+    
+    def _apply_staged_balances(self):
+        """Push committed balances into the cache (caller holds write_lock)"""
+        staged, self._staged_balances = self._staged_balances, {}
+        if self.balance_cache is None:
+            return
+        for address, balance in staged.items():
+            if balance is None:
+                self.balance_cache.invalidate(address)
+            else:
+                self.balance_cache.put(address, balance)
+    
+    def _check_external_writes(self):
+        """Clear the balance cache if another connection committed since the last check
+        
+        The caller holds write_lock, so the writer connection is free to use.
+        """
+        if self.balance_cache is None:
+            return
+        self._next_external_check = time.monotonic() + self.external_write_check_interval
+        version = self._writer.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self.balance_cache.clear()
+    
+    def invalidate_balances(self):
+        """Drop every cached balance (e.g. after another process wrote to the database)"""
+        if self.balance_cache is not None:
+            self.balance_cache.clear()
+    
+    def close(self):
+        """Close the writer and every pooled reader connection (call on shutdown)"""
+        if self._committer is not None:
+            # Drain queued transfers before the writer goes away
+            self._commit_queue.put(None)
+            self._committer.join()
+            self._committer = None
+        
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        
+        with self.write_lock:
+            self._writer.close()
     
     def init_database(self):
         """Initialize database tables"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+        with self._write_transaction() as cursor:
             # Wallets table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS wallets (
@@ -39,152 +344,728 @@ class DatabaseManager:
                 )
             ''')
             
-            conn.commit()
-            conn.close()
+            # Apply pending migrations
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            for target, statements in enumerate(MIGRATIONS, start=1):
+                if version < target:
+                    for statement in statements:
+                        cursor.execute(statement)
+            if version < len(MIGRATIONS):
+                cursor.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
     
     def create_wallet(self, address: str, initial_balance: float):
         """Create a new wallet"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+        with self._write_transaction() as cursor:
             timestamp = datetime.now().isoformat()
             cursor.execute('''
                 INSERT OR REPLACE INTO wallets (address, balance, created_at)
                 VALUES (?, ?, ?)
             ''', (address, initial_balance, timestamp))
-            
-            conn.commit()
-            conn.close()
+            self._stage_balance(address, initial_balance)
     
-    def get_wallet(self, address: str) -> Optional[Dict]:
-        """Get wallet by address"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def create_wallets(self, wallets: Iterable[Tuple[str, float]]) -> int:
+        """Create many wallets from (address, initial_balance) pairs in one commit
+        
+        `wallets` may be a generator; rows are streamed into executemany while
+        the write lock is held, so it must be cheap to produce (no key derivation).
+        """
+        timestamp = datetime.now().isoformat()
+        with self._write_transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO wallets (address, balance, created_at)
+                VALUES (?, ?, ?)
+            ''', self._staged_rows(wallets, timestamp))
+            return cursor.rowcount
+    
+    def _staged_rows(self, wallets: Iterable[Tuple[str, float]], timestamp: str):
+        """Yield wallet insert rows, staging each balance for the cache"""
+        for address, balance in wallets:
+            self._stage_balance(address, balance)
+            yield address, balance, timestamp
+    
+    def import_wallets(self, wallets: Iterable[Tuple[str, float, str]], chunk_size: int = 5000) -> int:
+        """Bulk insert (address, balance, created_at) rows in one transaction; returns rows written
+        
+        Existing addresses are replaced, as in create_wallet. The balance cache is
+        cleared afterwards instead of staging every row.
+        """
+        count = 0
+        with self._write_transaction() as cursor:
+            for chunk in self._chunks(wallets, chunk_size):
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO wallets (address, balance, created_at)
+                    VALUES (?, ?, ?)
+                ''', chunk)
+                count += len(chunk)
+        self.invalidate_balances()
+        return count
+    
+    def import_transactions(self, transactions: Iterable[Tuple[str, str, float, Optional[float], str]],
+                            chunk_size: int = 5000, defer_indexes: bool = False) -> int:
+        """Bulk insert historical (from, to, amount, usd_amount, timestamp) rows; returns rows written
+        
+        Rows are history only: wallet balances are not touched. address_stats is
+        updated per chunk, so the cost grows with the import, not the ledger.
+        defer_indexes drops the secondary indexes and rebuilds them over the whole
+        table at the end; only worth it when the import dwarfs the existing ledger.
+        """
+        count = 0
+        with self._write_transaction() as cursor:
+            if defer_indexes:
+                for name in TRANSACTION_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
             
-            cursor.execute('''
-                SELECT address, balance, created_at FROM wallets WHERE address = ?
-            ''', (address,))
+            for chunk in self._chunks(transactions, chunk_size):
+                cursor.executemany('''
+                    INSERT INTO transactions (from_address, to_address, amount, usd_amount, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', chunk)
+                cursor.executemany(UPSERT_ADDRESS_STATS, self._aggregate_stats(chunk))
+                count += len(chunk)
             
-            row = cursor.fetchone()
-            conn.close()
+            if defer_indexes:
+                for statement in TRANSACTION_INDEXES.values():
+                    cursor.execute(statement)
+        return count
+    
+    @staticmethod
+    def _aggregate_stats(transactions: List[tuple]) -> List[tuple]:
+        """address_stats deltas for a chunk of (from, to, amount, usd_amount, timestamp) rows
+        
+        Counts as REBUILD_ADDRESS_STATS does: a self-transfer is one row for its address.
+        """
+        stats: Dict[str, list] = {}
+        
+        def add(address, sent, received, usd, timestamp):
+            entry = stats.get(address)
+            if entry is None:
+                stats[address] = [address, 1, sent, received, usd, timestamp, timestamp]
+                return
+            entry[1] += 1
+            entry[2] += sent
+            entry[3] += received
+            entry[4] += usd
+            entry[5] = min(entry[5], timestamp)
+            entry[6] = max(entry[6], timestamp)
+        
+        for from_address, to_address, amount, usd_amount, timestamp in transactions:
+            usd = usd_amount or 0.0
+            if from_address == to_address:
+                add(from_address, amount, amount, usd, timestamp)
+            else:
+                add(from_address, amount, 0.0, usd, timestamp)
+                add(to_address, 0.0, amount, usd, timestamp)
+        return [tuple(entry) for entry in stats.values()]
+    
+    @staticmethod
+    def _chunks(rows: Iterable, chunk_size: int) -> Iterator[List]:
+        """Split an iterable into lists of at most chunk_size rows"""
+        iterator = iter(rows)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def get_balance(self, address: str) -> Optional[float]:
+        """Get a wallet's balance, served from the balance cache when possible"""
+        generation = None
+        if self.balance_cache is not None:
+            # If a write is in progress, it checks for external commits itself
+            # once it holds SQLite's write lock
+            if time.monotonic() >= self._next_external_check and self.write_lock.acquire(blocking=False):
+                try:
+                    self._check_external_writes()
+                finally:
+                    self.write_lock.release()
+            balance = self.balance_cache.get(address)
             
-            if row:
-                return {
-                    'address': row[0],
-                    'balance': row[1],
-                    'created_at': row[2]
-                }
+            if balance is not None:
+                return balance
+            generation = self.balance_cache.generation
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT balance FROM wallets WHERE address = ?', (address,))
+        row = cursor.fetchone()
+        if not row:
             return None
+        
+        if self.balance_cache is not None:
+            # Skipped if a write committed meanwhile; our read may predate it
+            self.balance_cache.fill(address, row[0], generation)
+        return row[0]
+    
+    def get_wallet(self, address: str) -> Optional[Dict]:
+        """Get wallet by address"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT address, balance, created_at FROM wallets WHERE address = ?
+        ''', (address,))
+        
+        row = cursor.fetchone()
+        
+        if row:
+            return {
+                'address': row[0],
+                'balance': row[1],
+                'created_at': row[2]
+            }
+        return None
+    
+    def get_wallets(self, addresses: List[str]) -> Dict[str, Dict]:
+        """Get the wallets that exist among `addresses`, keyed by address"""
+        if not addresses:
+            return {}
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' * len(addresses))
+        cursor.execute(f'''
+            SELECT address, balance, created_at FROM wallets WHERE address IN ({placeholders})
+        ''', list(addresses))
+        
+        return {
+            row[0]: {'address': row[0], 'balance': row[1], 'created_at': row[2]}
+            for row in cursor.fetchall()
+        }
     
     def update_balance(self, address: str, new_balance: float):
         """Update wallet balance"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
+        with self._write_transaction() as cursor:
             cursor.execute('''
                 UPDATE wallets SET balance = ? WHERE address = ?
             ''', (new_balance, address))
-            
-            conn.commit()
-            conn.close()
+            self._stage_balance(address, new_balance)
+    
+    def _apply_transfer(self, cursor: sqlite3.Cursor, from_address: str,
+                        to_address: str, amount: float) -> Tuple[float, float]:
+        """Debit sender and credit recipient inside an open write transaction"""
+        # Get sender balance
+        cursor.execute('SELECT balance FROM wallets WHERE address = ?', (from_address,))
+        sender_row = cursor.fetchone()
+        if not sender_row:
+            raise ValueError("Sender wallet not found")
+        
+        sender_balance = sender_row[0]
+        if sender_balance < amount:
+            raise ValueError("Insufficient balance")
+        
+        # Get or create recipient wallet
+        cursor.execute('SELECT balance FROM wallets WHERE address = ?', (to_address,))
+        recipient_row = cursor.fetchone()
+        
+        if recipient_row:
+            recipient_balance = recipient_row[0]
+        else:
+            # Create recipient wallet with 0 balance
+            timestamp = datetime.now().isoformat()
+            cursor.execute('''
+                INSERT INTO wallets (address, balance, created_at)
+                VALUES (?, ?, ?)
+            ''', (to_address, 0.0, timestamp))
+            recipient_balance = 0.0
+        
+        # Update balances
+        new_sender_balance = sender_balance - amount
+        new_recipient_balance = recipient_balance + amount
+        
+        cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?', 
+                     (new_sender_balance, from_address))
+        cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?', 
+                     (new_recipient_balance, to_address))
+        self._stage_balance(from_address, new_sender_balance)
+        self._stage_balance(to_address, new_recipient_balance)
+        
+        return new_sender_balance, new_recipient_balance
+    
+    def _insert_transaction(self, cursor: sqlite3.Cursor, from_address: str, to_address: str,
+                            amount: float, usd_amount: Optional[float] = None) -> int:
+        """Insert a transaction row inside an open write transaction and return its id"""
+        timestamp = datetime.now().isoformat()
+        cursor.execute('''
+            INSERT INTO transactions (from_address, to_address, amount, usd_amount, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (from_address, to_address, amount, usd_amount, timestamp))
+        tx_id = cursor.lastrowid
+        
+        # Keep address_stats in step with the ledger, in the same transaction
+        usd_volume = usd_amount or 0.0
+        if from_address == to_address:
+            stats_rows = [(from_address, 1, amount, amount, usd_volume, timestamp, timestamp)]
+        else:
+            stats_rows = [
+                (from_address, 1, amount, 0.0, usd_volume, timestamp, timestamp),
+                (to_address, 1, 0.0, amount, usd_volume, timestamp, timestamp)
+            ]
+        cursor.executemany(UPSERT_ADDRESS_STATS, stats_rows)
+        
+        return tx_id
     
     def transfer_balance(self, from_address: str, to_address: str, amount: float):
         """Transfer balance between wallets"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            try:
-                # Start transaction
-                cursor.execute('BEGIN TRANSACTION')
-                
-                # Get sender balance
-                cursor.execute('SELECT balance FROM wallets WHERE address = ?', (from_address,))
-                sender_row = cursor.fetchone()
-                if not sender_row:
-                    raise ValueError("Sender wallet not found")
-                
-                sender_balance = sender_row[0]
-                if sender_balance < amount:
-                    raise ValueError("Insufficient balance")
-                
-                # Get or create recipient wallet
-                cursor.execute('SELECT balance FROM wallets WHERE address = ?', (to_address,))
-                recipient_row = cursor.fetchone()
-                
-                if recipient_row:
-                    recipient_balance = recipient_row[0]
-                else:
-                    # Create recipient wallet with 0 balance
-                    timestamp = datetime.now().isoformat()
-                    cursor.execute('''
-                        INSERT INTO wallets (address, balance, created_at)
-                        VALUES (?, ?, ?)
-                    ''', (to_address, 0.0, timestamp))
-                    recipient_balance = 0.0
-                
-                # Update balances
-                new_sender_balance = sender_balance - amount
-                new_recipient_balance = recipient_balance + amount
-                
-                cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?', 
-                             (new_sender_balance, from_address))
-                cursor.execute('UPDATE wallets SET balance = ? WHERE address = ?', 
-                             (new_recipient_balance, to_address))
-                
-                # Commit transaction
-                cursor.execute('COMMIT')
-                
-            except Exception as e:
-                cursor.execute('ROLLBACK')
-                raise e
-            finally:
-                conn.close()
+        with self._write_transaction() as cursor:
+            self._apply_transfer(cursor, from_address, to_address, amount)
     
     def add_transaction(self, from_address: str, to_address: str, 
                        amount: float, usd_amount: Optional[float] = None):
         """Add transaction record"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        with self._write_transaction() as cursor:
+            self._insert_transaction(cursor, from_address, to_address, amount, usd_amount)
+    
+    def _record_transfer(self, cursor: sqlite3.Cursor, from_address: str, to_address: str,
+                         amount: float, usd_amount: Optional[float] = None,
+                         notification: Optional[Dict] = None) -> Dict:
+        """Apply and record one transfer inside an open write transaction"""
+        from_balance, to_balance = self._apply_transfer(cursor, from_address, to_address, amount)
+        tx_id = self._insert_transaction(cursor, from_address, to_address, amount, usd_amount)
+        if notification is not None:
+            self._insert_notification(cursor, 'transaction', notification)
+        
+        return {
+            'tx_id': tx_id,
+            'from_balance': from_balance,
+            'to_balance': to_balance
+        }
+    
+    def transfer_and_record(self, from_address: str, to_address: str,
+                            amount: float, usd_amount: Optional[float] = None,
+                            notification: Optional[Dict] = None) -> Dict:
+        """Debit, credit and record a transfer in a single transaction (one commit)
+        
+        If `notification` is given it is queued in the outbox in the same commit.
+        """
+        args = (from_address, to_address, amount, usd_amount, notification)
+        if self.group_commit:
+            future = Future()
+            self._commit_queue.put((args, future))
+            # Resolved only once the batch containing this transfer has committed
+            return future.result()
+        
+        with self._write_transaction() as cursor:
+            return self._record_transfer(cursor, *args)
+    
+    def _group_commit_loop(self):
+        """Collect queued transfers into batches and commit each batch once"""
+        while True:
+            first = self._commit_queue.get()
+            if first is None:
+                return
             
-            timestamp = datetime.now().isoformat()
-            cursor.execute('''
-                INSERT INTO transactions (from_address, to_address, amount, usd_amount, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (from_address, to_address, amount, usd_amount, timestamp))
+            # Wait up to the window for more transfers, capped at max_batch
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.group_commit_window_ms / 1000
+            while len(batch) < self.group_commit_max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._commit_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
             
-            conn.commit()
-            conn.close()
+            self._commit_batch(batch)
+            if stopping:
+                return
+    
+    def _commit_batch(self, batch: List[Tuple[tuple, Future]]):
+        """Apply a batch of transfers in arrival order and commit them together"""
+        outcomes = []
+        try:
+            with self._write_transaction() as cursor:
+                for args, future in batch:
+                    # A savepoint per transfer lets one rejection (e.g. insufficient
+                    # balance) roll back alone while the rest of the batch commits
+                    cursor.execute('SAVEPOINT transfer')
+                    staged = dict(self._staged_balances)
+                    try:
+                        result = self._record_transfer(cursor, *args)
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO transfer')
+                        self._staged_balances = staged
+                        cursor.execute('RELEASE transfer')
+                        outcomes.append((future, None, e))
+                    else:
+                        cursor.execute('RELEASE transfer')
+                        outcomes.append((future, result, None))
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was applied
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
     
-    def get_transactions(self, address: str) -> List[Dict]:
-        """Get transaction history for an address"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def record_batch_payout(self, from_address: str, legs: List[Dict], merkle_root: str,
+                            signature: str, leaves: List[str], proofs: List[List[str]],
+                            nonce: str) -> Dict:
+        """Apply every leg of a signed batch payout in one transaction
+        
+        Each leg is {'to_address', 'amount_eth', 'amount_usd'}. The sender is
+        debited the total once; the batch is all-or-nothing. Each (from_address,
+        nonce) is accepted once, so a replayed batch is rejected.
+        """
+        # A negative leg would debit its recipient through the upsert below
+        if any(not leg['amount_eth'] > 0 for leg in legs):
+            raise ValueError("Every payout leg must be a positive amount")
+        total = sum(leg['amount_eth'] for leg in legs)
+        timestamp = datetime.now().isoformat()
+        
+        with self._write_transaction() as cursor:
+            cursor.execute('SELECT balance FROM wallets WHERE address = ?', (from_address,))
+            sender_row = cursor.fetchone()
+            if not sender_row:
+                raise ValueError("Sender wallet not found")
+            if sender_row[0] < total:
+                raise ValueError("Insufficient balance")
             
-            cursor.execute('''
-                SELECT from_address, to_address, amount, usd_amount, timestamp
-                FROM transactions
-                WHERE from_address = ? OR to_address = ?
-                ORDER BY timestamp DESC
-                LIMIT 50
-            ''', (address, address))
+            try:
+                cursor.execute('''
+                    INSERT INTO payout_batches (from_address, merkle_root, signature, leg_count, total_amount,
+                                                created_at, nonce)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (from_address, merkle_root, signature, len(legs), total, timestamp, nonce))
+            except sqlite3.IntegrityError:
+                raise ValueError("Batch payout already executed")
+            batch_id = cursor.lastrowid
             
-            rows = cursor.fetchall()
-            conn.close()
+            cursor.execute('UPDATE wallets SET balance = balance - ? WHERE address = ?',
+                           (total, from_address))
+            # Credit recipients, creating missing wallets with the leg amount
+            cursor.executemany('''
+                INSERT INTO wallets (address, balance, created_at) VALUES (?, ?, ?)
+                ON CONFLICT (address) DO UPDATE SET balance = balance + excluded.balance
+            ''', ((leg['to_address'], leg['amount_eth'], timestamp) for leg in legs))
+            
+            tx_ids = []
+            for index, leg in enumerate(legs):
+                tx_id = self._insert_transaction(cursor, from_address, leg['to_address'],
+                                                 leg['amount_eth'], leg.get('amount_usd'))
+                cursor.execute('''
+                    INSERT INTO payout_legs (batch_id, leg_index, tx_id, leaf_hash, proof)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (batch_id, index, tx_id, leaves[index], json.dumps(proofs[index])))
+                tx_ids.append(tx_id)
             
-            transactions = []
-            for row in rows:
-                transactions.append({
-                    'from_address': row[0],
-                    'to_address': row[1],
-                    'amount': row[2],
-                    'usd_amount': row[3],
-                    'timestamp': row[4]
-                })
+            cursor.execute('SELECT balance FROM wallets WHERE address = ?', (from_address,))
+            from_balance = cursor.fetchone()[0]
             
-            return transactions
+            # Recipient balances were updated in SQL, so drop them rather than re-read
+            for leg in legs:
+                self._stage_balance(leg['to_address'], None)
+            self._stage_balance(from_address, from_balance)
+        
+        return {
+            'batch_id': batch_id,
+            'tx_ids': tx_ids,
+            'from_balance': from_balance
+        }
+    
+    def get_payout_leg(self, batch_id: int, leg_index: int) -> Optional[Dict]:
+        """Get one payout leg with its transaction, Merkle proof and the batch root"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT b.from_address, b.merkle_root, b.signature, l.tx_id, l.leaf_hash, l.proof,
+                   t.to_address, t.amount, t.usd_amount
+            FROM payout_legs l
+            JOIN payout_batches b ON b.id = l.batch_id
+            JOIN transactions t ON t.id = l.tx_id
+            WHERE l.batch_id = ? AND l.leg_index = ?
+        ''', (batch_id, leg_index))
+        
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            'batch_id': batch_id,
+            'leg_index': leg_index,
+            'from_address': row[0],
+            'merkle_root': row[1],
+            'signature': row[2],
+            'tx_id': row[3],
+            'leaf_hash': row[4],
+            'proof': json.loads(row[5]),
+            'to_address': row[6],
+            'amount_eth': row[7],
+            'amount_usd': row[8]
+        }
+    
+    def get_address_stats(self, address: str) -> Dict:
+        """Ledger statistics for an address (a single primary-key lookup)"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT tx_count, total_sent, total_received, usd_volume, first_activity, last_activity
+            FROM address_stats WHERE address = ?
+        ''', (address,))
+        
+        row = cursor.fetchone() or (0, 0.0, 0.0, 0.0, None, None)
+        return {
+            'address': address,
+            'tx_count': row[0],
+            'total_sent': row[1],
+            'total_received': row[2],
+            'usd_volume': row[3],
+            'first_activity': row[4],
+            'last_activity': row[5]
+        }
+    
+    def rebuild_address_stats(self) -> int:
+        """Recompute address_stats from the full ledger; returns the number of addresses"""
+        with self._write_transaction() as cursor:
+            for statement in REBUILD_ADDRESS_STATS:
+                cursor.execute(statement)
+            cursor.execute('SELECT COUNT(*) FROM address_stats')
+            return cursor.fetchone()[0]
+    
+    def _insert_notification(self, cursor: sqlite3.Cursor, kind: str, payload: Dict) -> int:
+        """Queue a notification in the outbox inside an open write transaction"""
+        cursor.execute('''
+            INSERT INTO notification_outbox (kind, payload, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (kind, json.dumps(payload), time.time(), datetime.now().isoformat()))
+        return cursor.lastrowid
+    
+    def enqueue_notification(self, kind: str, payload: Dict) -> int:
+        """Queue a notification in the outbox on its own"""
+        with self._write_transaction() as cursor:
+            return self._insert_notification(cursor, kind, payload)
+    
+    def claim_notifications(self, limit: int, lease_seconds: float) -> List[Dict]:
+        """Lease up to `limit` due outbox rows to the caller
+        
+        Claimed rows become due again after `lease_seconds`, so rows held by a
+        worker that died are retried rather than lost.
+        """
+        now = time.time()
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                SELECT id, kind, payload, attempts FROM notification_outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            ''', (now, limit))
+            rows = cursor.fetchall()
+            cursor.executemany('''
+                UPDATE notification_outbox SET status = 'sending', next_attempt_at = ?
+                WHERE id = ?
+            ''', [(now + lease_seconds, row[0]) for row in rows])
+        
+        return [
+            {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]), 'attempts': row[3]}
+            for row in rows
+        ]
+    
+    def complete_notification(self, notification_id: int):
+        """Mark an outbox row as delivered"""
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                UPDATE notification_outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL
+                WHERE id = ?
+            ''', (notification_id,))
+    
+    def fail_notification(self, notification_id: int, error: str,
+                          retry_at: Optional[float] = None):
+        """Record a failed delivery: retry at `retry_at`, or dead-letter it if None"""
+        with self._write_transaction() as cursor:
+            if retry_at is None:
+                cursor.execute('''
+                    UPDATE notification_outbox SET status = 'dead', attempts = attempts + 1, last_error = ?
+                    WHERE id = ?
+                ''', (error, notification_id))
+            else:
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+                    WHERE id = ?
+                ''', (error, retry_at, notification_id))
+    
+    def get_outbox_counts(self) -> Dict[str, int]:
+        """Number of outbox rows per status"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM notification_outbox GROUP BY status')
+        return dict(cursor.fetchall())
+    
+    @staticmethod
+    def _encode_cursor(timestamp: str, tx_id: int) -> str:
+        """Build an opaque pagination cursor from a row's sort key"""
+        return f"{timestamp}|{tx_id}"
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, int]:
+        """Split a pagination cursor back into (timestamp, id)"""
+        try:
+            timestamp, tx_id = cursor.rsplit('|', 1)
+            return timestamp, int(tx_id)
+        except (AttributeError, ValueError):
+            raise ValueError("Invalid transaction cursor")
+    
+    def get_transactions(self, address: str, before: Optional[str] = None,
+                         limit: int = 50, direction: Optional[str] = None,
+                         counterparty: Optional[str] = None, since: Optional[str] = None,
+                         until: Optional[str] = None) -> List[Dict]:
+        """Get transaction history for an address, newest first
+        
+        Pass the 'cursor' of the last row returned as `before` to fetch the next page.
+        Optional filters: direction ('sent' or 'received'), counterparty address and
+        ISO timestamp range [since, until).
+        """
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        if direction not in (None, 'sent', 'received'):
+            raise ValueError("direction must be 'sent' or 'received'")
+        
+        filters = ''
+        filter_params = []
+        if before is not None:
+            before_timestamp, before_id = self._decode_cursor(before)
+            filters += ' AND (timestamp, id) < (?, ?)'
+            filter_params += [before_timestamp, before_id]
+        if since:
+            filters += ' AND timestamp >= ?'
+            filter_params.append(since)
+        if until:
+            filters += ' AND timestamp < ?'
+            filter_params.append(until)
+        
+        # Each branch walks one address index newest-first and stops after
+        # `limit` rows, so a page costs O(limit) regardless of ledger size.
+        # Self-transfers are only taken from the sender branch.
+        branches = []
+        params = []
+        if direction in (None, 'sent'):
+            counterparty_filter = ' AND to_address = ?' if counterparty else ''
+            branches.append(f'''
+                SELECT * FROM (
+                    SELECT id, from_address, to_address, amount, usd_amount, timestamp
+                    FROM transactions
+                    WHERE from_address = ?{counterparty_filter}{filters}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                )
+            ''')
+            params += [address, *([counterparty] if counterparty else []), *filter_params, limit]
+        if direction in (None, 'received'):
+            counterparty_filter = ' AND from_address = ?' if counterparty else ''
+            branches.append(f'''
+                SELECT * FROM (
+                    SELECT id, from_address, to_address, amount, usd_amount, timestamp
+                    FROM transactions
+                    WHERE to_address = ? AND from_address != ?{counterparty_filter}{filters}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                )
+            ''')
+            params += [address, address, *([counterparty] if counterparty else []), *filter_params, limit]
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, from_address, to_address, amount, usd_amount, timestamp FROM (
+                {' UNION ALL '.join(branches)}
+            )
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit))
+        
+        rows = cursor.fetchall()
+        
+        transactions = []
+        for row in rows:
+            transactions.append({
+                'id': row[0],
+                'from_address': row[1],
+                'to_address': row[2],
+                'amount': row[3],
+                'usd_amount': row[4],
+                'timestamp': row[5],
+                'cursor': self._encode_cursor(row[5], row[0])
+            })
+        
+        return transactions
+    
+    def iter_transactions(self, address: Optional[str] = None, since: Optional[str] = None,
+                          until: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream transactions oldest first in constant memory
+        
+        Optionally filtered by address and by ISO timestamp range [since, until).
+        Rows are pulled with fetchmany; nothing is collected into a list.
+        """
+        time_filter = ''
+        time_params = []
+        if since:
+            time_filter += ' AND timestamp >= ?'
+            time_params.append(since)
+        if until:
+            time_filter += ' AND timestamp < ?'
+            time_params.append(until)
+        
+        columns = 'id, from_address, to_address, amount, usd_amount, timestamp'
+        if address is None:
+            queries = [(f'''
+                SELECT {columns} FROM transactions
+                WHERE 1 = 1 {time_filter}
+                ORDER BY timestamp, id
+            ''', time_params)]
+        else:
+            # One ordered walk per address index, merged below without sorting
+            queries = [
+                (f'''
+                    SELECT {columns} FROM transactions
+                    WHERE from_address = ? {time_filter}
+                    ORDER BY timestamp, id
+                ''', [address, *time_params]),
+                (f'''
+                    SELECT {columns} FROM transactions
+                    WHERE to_address = ? AND from_address != ? {time_filter}
+                    ORDER BY timestamp, id
+                ''', [address, address, *time_params])
+            ]
+        
+        # A dedicated connection, so a paused export never shares a cursor with
+        # other reads made by this thread. ORDER BY timestamp has no index on the
+        # unfiltered path, so its sort must be able to spill to temp files
+        conn = self._connect(read_only=True, temp_store='FILE')
+        
+        try:
+            streams = [self._fetch_stream(conn, sql, params, batch_size) for sql, params in queries]
+            for row in heapq.merge(*streams, key=lambda row: (row[5], row[0])):
+                yield {
+                    'id': row[0],
+                    'from_address': row[1],
+                    'to_address': row[2],
+                    'amount': row[3],
+                    'usd_amount': row[4],
+                    'timestamp': row[5]
+                }
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _fetch_stream(conn: sqlite3.Connection, sql: str, params: list,
+                      batch_size: int) -> Iterator[tuple]:
+        """Yield rows of a query, fetching batch_size at a time"""
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
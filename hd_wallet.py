@@ -0,0 +1,45 @@
+from typing import Dict, List, Tuple
+from eth_account import Account
+from eth_account.hdaccount import seed_from_mnemonic
+from eth_account.hdaccount.deterministic import Node, derive_child_key, hmac_sha512
+from eth_account.signers.local import LocalAccount
+
+# BIP44 Ethereum external chain; account i lives at m/44'/60'/0'/0/i
+ETHEREUM_ACCOUNT_PARENT_PATH = "m/44'/60'/0'/0"
+
+class HDKeychain:
+    """Derives many accounts from one mnemonic with a single seed computation
+    
+    The PBKDF2 seed stretch and the hardened path down to the parent node run
+    once in __init__; each account index after that is one child derivation.
+    """
+    
+    def __init__(self, mnemonic: str, passphrase: str = "",
+                 parent_path: str = ETHEREUM_ACCOUNT_PARENT_PATH):
+        self.parent_path = parent_path
+        
+        seed = seed_from_mnemonic(mnemonic, passphrase)
+        master = hmac_sha512(b"Bitcoin seed", seed)
+        key, chain_code = master[:32], master[32:]
+        for part in parent_path.split('/')[1:]:
+            key, chain_code = derive_child_key(key, chain_code, Node.decode(part))
+        self._parent_key = key
+        self._parent_chain_code = chain_code
+        self._accounts: Dict[int, LocalAccount] = {}
+    
+    def path(self, index: int) -> str:
+        """Full derivation path for an account index"""
+        return f"{self.parent_path}/{index}"
+    
+    def account(self, index: int) -> LocalAccount:
+        """Account at parent_path/index (derived once, then memoized)"""
+        account = self._accounts.get(index)
+        if account is None:
+            child_key, _ = derive_child_key(self._parent_key, self._parent_chain_code,
+                                            Node.decode(str(index)))
+            account = self._accounts[index] = Account.from_key(child_key)
+        return account
+    
+    def accounts(self, count: int, start: int = 0) -> List[Tuple[int, LocalAccount]]:
+        """(index, account) pairs for indexes start .. start+count-1"""
+        return [(index, self.account(index)) for index in range(start, start + count)]
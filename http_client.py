@@ -0,0 +1,156 @@
+import bisect
+import os
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+# Default per-upstream timeouts in seconds
+DEFAULT_TIMEOUTS = {
+    'coingecko': 5.0,
+    'skip': 10.0,
+    'resend': 10.0
+}
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (cumulative counts on export)"""
+    
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, elapsed_ms: float):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets_ms, elapsed_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum_ms += elapsed_ms
+    
+    def snapshot(self) -> Dict:
+        """Cumulative bucket counts plus count/sum/mean"""
+        with self._lock:
+            counts = list(self.counts)
+            count, sum_ms = self.count, self.sum_ms
+        
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets_ms + ['+Inf'], counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': count,
+            'sum_ms': sum_ms,
+            'mean_ms': sum_ms / count if count else 0.0,
+            'buckets': buckets
+        }
+
+# Every UpstreamLatency (including each HttpClient), so metrics.py can export their histograms
+_clients = weakref.WeakSet()
+
+def live_clients() -> List["UpstreamLatency"]:
+    """HttpClient and other UpstreamLatency instances that are still referenced"""
+    return list(_clients)
+
+class UpstreamLatency:
+    """Per-upstream request latency histograms and error counts, exported by metrics.py"""
+    
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        _clients.add(self)
+    
+    def _histogram(self, upstream: str) -> LatencyHistogram:
+        with self._lock:
+            histogram = self._histograms.get(upstream)
+            if histogram is None:
+                histogram = self._histograms[upstream] = LatencyHistogram()
+            return histogram
+    
+    def observe(self, upstream: str, elapsed_ms: float):
+        """Record one request's latency"""
+        self._histogram(upstream).observe(elapsed_ms)
+    
+    def record_error(self, upstream: str):
+        """Count a request that failed to connect or timed out"""
+        with self._lock:
+            self._errors[upstream] = self._errors.get(upstream, 0) + 1
+    
+    def latency_stats(self) -> Dict[str, Dict]:
+        """Per-upstream latency histograms and error counts"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            errors = dict(self._errors)
+        stats = {}
+        for upstream, histogram in histograms.items():
+            stats[upstream] = histogram.snapshot()
+            stats[upstream]['errors'] = errors.get(upstream, 0)
+        return stats
+
+class HttpClient(UpstreamLatency):
+    """Shared keep-alive HTTP client with pooling, retries and per-upstream latency"""
+    
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20,
+                 retries: int = 2, backoff_factor: float = 0.3,
+                 timeouts: Optional[Dict[str, float]] = None, default_timeout: float = 10.0):
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.default_timeout = default_timeout
+        
+        # Connection errors are always retried; HTTP 429/5xx only for idempotent
+        # methods (urllib3's default), so an email POST is never sent twice
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        super().__init__()
+    
+    def request(self, method: str, url: str, upstream: str, **kwargs) -> requests.Response:
+        """Send a request over the pooled session, timing it under `upstream`"""
+        kwargs.setdefault('timeout', self.timeouts.get(upstream, self.default_timeout))
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.record_error(upstream)
+            raise
+        finally:
+            self.observe(upstream, (time.perf_counter() - start) * 1000)
+    
+    def get(self, url: str, upstream: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, upstream, **kwargs)
+    
+    def post(self, url: str, upstream: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, upstream, **kwargs)
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+# Shared by WalletService and NotificationService so connections are reused
+http_client = HttpClient(
+    pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '10')),
+    pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '20')),
+    retries=int(os.getenv('HTTP_RETRIES', '2'))
+)
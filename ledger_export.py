@@ -0,0 +1,72 @@
+import csv
+import json
+from typing import Dict, IO, Iterable, Iterator, List
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet", "arrow")
+EXPORT_COLUMNS = ["id", "from_address", "to_address", "amount", "usd_amount", "timestamp"]
+
+def _batches(rows: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _arrow_schema():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Parquet/Arrow export requires pyarrow (pip install pyarrow)")
+    return pa, pa.schema([
+        ("id", pa.int64()),
+        ("from_address", pa.string()),
+        ("to_address", pa.string()),
+        ("amount", pa.float64()),
+        ("usd_amount", pa.float64()),
+        ("timestamp", pa.string())
+    ])
+
+def export_transactions(rows: Iterable[Dict], file_format: str, out: IO,
+                        batch_size: int = 10000) -> int:
+    """Write transaction rows to `out` as CSV, JSONL, Parquet or Arrow IPC; returns the row count
+    
+    CSV and JSONL need a text stream, Parquet and Arrow a binary one. Rows are
+    consumed as they arrive (columnar formats in batch_size record batches).
+    """
+    file_format = file_format.lower()
+    count = 0
+    
+    if file_format == "csv":
+        writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    
+    elif file_format == "jsonl":
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    
+    elif file_format in ("parquet", "arrow"):
+        pa, schema = _arrow_schema()
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(out, schema)
+        else:
+            writer = pa.ipc.new_stream(out, schema)
+        try:
+            for batch in _batches(rows, batch_size):
+                columns = [[row[name] for row in batch] for name in EXPORT_COLUMNS]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                count += len(batch)
+        finally:
+            writer.close()
+    
+    else:
+        raise ValueError(f"Export format must be one of {', '.join(EXPORT_FORMATS)}")
+    
+    return count
@@ -0,0 +1,97 @@
+import csv
+import json
+import re
+from datetime import datetime
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+IMPORT_TABLES = ("wallets", "transactions")
+
+ADDRESS_PATTERN = re.compile(r'0x[0-9a-fA-F]{40}')
+
+def _read_records(source: IO, file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """Yield (line_number, record) pairs from a CSV or JSONL text stream"""
+    file_format = file_format.lower()
+    if file_format == 'csv':
+        # Line 1 is the header
+        yield from enumerate(csv.DictReader(source), start=2)
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(source, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+    else:
+        raise ValueError("Import file must be CSV or JSONL")
+
+def _batches(records: Iterator[Tuple[int, Dict]], batch_size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _validate_addresses(batch: List[Tuple[int, Dict]], fields: Tuple[str, ...]):
+    """Check every address in a batch, matching each distinct value only once"""
+    distinct = {str(record.get(field) or '').strip() for _, record in batch for field in fields}
+    invalid = {address for address in distinct if not ADDRESS_PATTERN.fullmatch(address)}
+    if not invalid:
+        return
+    for line_number, record in batch:
+        for field in fields:
+            value = str(record.get(field) or '').strip()
+            if value in invalid:
+                raise ValueError(f"Line {line_number}: invalid {field} {value!r}")
+
+def _amount(record: Dict, field: str, line_number: int, required: bool = True) -> Optional[float]:
+    value = record.get(field)
+    if value in (None, '') and not required:
+        return None
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Line {line_number}: invalid {field}")
+    if amount < 0:
+        raise ValueError(f"Line {line_number}: {field} must not be negative")
+    return amount
+
+def _timestamp(record: Dict, field: str, line_number: int, default: str) -> str:
+    value = str(record.get(field) or '').strip()
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"Line {line_number}: invalid {field} {value!r}")
+
+def read_wallet_rows(source: IO, file_format: str,
+                     batch_size: int = 5000) -> Iterator[Tuple[str, float, str]]:
+    """Stream validated (address, balance, created_at) rows from address/balance[/created_at] records"""
+    now = datetime.now().isoformat()
+    for batch in _batches(_read_records(source, file_format), batch_size):
+        _validate_addresses(batch, ('address',))
+        for line_number, record in batch:
+            yield (
+                record['address'].strip(),
+                _amount(record, 'balance', line_number),
+                _timestamp(record, 'created_at', line_number, now)
+            )
+
+def read_transaction_rows(source: IO, file_format: str,
+                          batch_size: int = 5000) -> Iterator[Tuple[str, str, float, Optional[float], str]]:
+    """Stream validated (from, to, amount, usd_amount, timestamp) rows
+    
+    Records need from_address, to_address and amount; usd_amount and timestamp
+    are optional.
+    """
+    now = datetime.now().isoformat()
+    for batch in _batches(_read_records(source, file_format), batch_size):
+        _validate_addresses(batch, ('from_address', 'to_address'))
+        for line_number, record in batch:
+            yield (
+                record['from_address'].strip(),
+                record['to_address'].strip(),
+                _amount(record, 'amount', line_number),
+                _amount(record, 'usd_amount', line_number, required=False),
+                _timestamp(record, 'timestamp', line_number, now)
+            )
@@ -0,0 +1,42 @@
+from typing import List
+from eth_utils import keccak
+
+def _hash_pair(left: bytes, right: bytes) -> bytes:
+    return keccak(left + right)
+
+def build_tree(leaves: List[bytes]) -> List[List[bytes]]:
+    """Build every level of a Merkle tree, leaves first and the root last
+    
+    A level with an odd number of nodes pairs its last node with itself.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = level + [level[-1]]
+        levels.append([_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)])
+    return levels
+
+def merkle_root(levels: List[List[bytes]]) -> bytes:
+    return levels[-1][0]
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[str]:
+    """Sibling hashes (hex) from leaf `index` up to the root"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        proof.append('0x' + (level[sibling] if sibling < len(level) else level[index]).hex())
+        index //= 2
+    return proof
+
+def verify_proof(leaf: bytes, index: int, proof: List[str], root: bytes) -> bool:
+    """Check that `leaf` sits at `index` under `root`"""
+    node = leaf
+    for sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex[2:])
+        node = _hash_pair(sibling, node) if index % 2 else _hash_pair(node, sibling)
+        index //= 2
+    return node == root
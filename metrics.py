@@ -0,0 +1,239 @@
+import functools
+import inspect
+import os
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from http_client import LatencyHistogram, live_clients
+
+load_dotenv()
+
+# Method latency buckets in milliseconds: database calls take microseconds,
+# WalletService calls that sign or hit the network take up to seconds
+METHOD_BUCKETS_MS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100,
+                     250, 500, 1000, 2500, 5000, 10000]
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+def _render_histogram(lines: List[str], name: str, labels: str, snapshot: Dict):
+    """Append Prometheus histogram samples for a LatencyHistogram snapshot (ms -> seconds)"""
+    for bound, count in snapshot['buckets'].items():
+        le = bound if bound == '+Inf' else repr(float(bound) / 1000)
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {snapshot["sum_ms"] / 1000}')
+    lines.append(f'{name}_count{{{labels}}} {snapshot["count"]}')
+
+class Metrics:
+    """Opt-in timing of public methods, plus write-lock, cache and HTTP metrics, in Prometheus text format
+    
+    Classes are registered with @instrument(component) but left untouched until
+    enable() wraps their public methods, so disabled metrics cost nothing.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self._classes: List[Tuple[str, type]] = []
+        self._originals: List[Tuple[type, str, object]] = []
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._databases = weakref.WeakSet()
+        # component -> objects whose stats() counters are exported
+        self._stats_sources: Dict[str, weakref.WeakSet] = {}
+        self._stats_gauges: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def instrument(self, component: str):
+        """Class decorator: time every public method under `component` once enabled"""
+        def register(cls):
+            with self._lock:
+                self._classes.append((component, cls))
+                if self.enabled:
+                    self._wrap_class(component, cls)
+            return cls
+        return register
+    
+    def track_database(self, db):
+        """Export a DatabaseManager's write-lock wait counters (weakly referenced)"""
+        self._databases.add(db)
+    
+    def track_stats(self, component: str, source, gauges: Tuple[str, ...] = ()):
+        """Export source.stats(): integer values as counters, `gauges` as gauges (weakly referenced)"""
+        with self._lock:
+            self._stats_sources.setdefault(component, weakref.WeakSet()).add(source)
+            self._stats_gauges[component] = set(gauges)
+    
+    def enable(self):
+        """Wrap the public methods of every registered class"""
+        with self._lock:
+            if self.enabled:
+                return
+            self.enabled = True
+            for component, cls in self._classes:
+                self._wrap_class(component, cls)
+    
+    def disable(self):
+        """Restore the original methods (collected samples are kept)"""
+        with self._lock:
+            for cls, name, original in reversed(self._originals):
+                setattr(cls, name, original)
+            self._originals = []
+            self.enabled = False
+    
+    def _wrap_class(self, component: str, cls: type):
+        for name, attribute in list(vars(cls).items()):
+            # Generators would only be timed until their first yield
+            if (name.startswith('_') or not inspect.isfunction(attribute)
+                    or inspect.isgeneratorfunction(attribute)):
+                continue
+            self._originals.append((cls, name, attribute))
+            setattr(cls, name, self._timed(component, name, attribute))
+    
+    def _timed(self, component: str, name: str, method):
+        key = (component, name)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram(METHOD_BUCKETS_MS)
+        perf_counter = time.perf_counter
+        
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._errors[key] = self._errors.get(key, 0) + 1
+                raise
+            finally:
+                histogram.observe((perf_counter() - start) * 1000)
+        return timed
+    
+    def render(self) -> str:
+        """Every metric in Prometheus text exposition format"""
+        lines = [
+            '# HELP wallet_method_duration_seconds Time spent in instrumented public methods',
+            '# TYPE wallet_method_duration_seconds histogram'
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            errors = dict(self._errors)
+        for (component, method), histogram in histograms:
+            _render_histogram(lines, 'wallet_method_duration_seconds',
+                              _labels(component=component, method=method), histogram.snapshot())
+        
+        lines += [
+            '# HELP wallet_method_errors_total Instrumented calls that raised',
+            '# TYPE wallet_method_errors_total counter'
+        ]
+        for (component, method), count in sorted(errors.items()):
+            lines.append(f'wallet_method_errors_total{{{_labels(component=component, method=method)}}} {count}')
+        
+        databases = [(db.lock_stats(), _labels(db=db.db_path)) for db in list(self._databases)]
+        for name, kind, key, help_text in (
+            ('wallet_db_write_transactions_total', 'counter', 'write_transactions', 'Write transactions started'),
+            ('wallet_db_write_lock_wait_seconds_total', 'counter', 'write_lock_wait',
+             'Time waiting for the in-process write lock'),
+            ('wallet_db_begin_wait_seconds_total', 'counter', 'begin_wait',
+             "Time waiting for SQLite's write lock (BEGIN IMMEDIATE)"),
+            ('wallet_db_max_write_wait_seconds', 'gauge', 'max_wait', 'Longest single wait for both write locks')
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for stats, labels in databases:
+                lines.append(f'{name}{{{labels}}} {stats[key]}')
+        
+        # Cache and quote counters, summed over every instance of a component
+        with self._lock:
+            sources = {component: list(objects) for component, objects in self._stats_sources.items()}
+            gauge_names = dict(self._stats_gauges)
+        counters: Dict[Tuple[str, str], float] = {}
+        gauges: Dict[Tuple[str, str], float] = {}
+        for component, objects in sorted(sources.items()):
+            for source in objects:
+                for event, value in source.stats().items():
+                    if event in gauge_names[component]:
+                        gauges[(component, event)] = gauges.get((component, event), 0) + value
+                    elif isinstance(value, int):
+                        counters[(component, event)] = counters.get((component, event), 0) + value
+        lines += [
+            '# HELP wallet_cache_events_total Cache and quote engine counters by component and event',
+            '# TYPE wallet_cache_events_total counter'
+        ]
+        for (component, event), value in sorted(counters.items()):
+            lines.append(f'wallet_cache_events_total{{{_labels(component=component, event=event)}}} {value}')
+        lines += [
+            '# HELP wallet_cache_entries Entries currently held by each cache',
+            '# TYPE wallet_cache_entries gauge'
+        ]
+        for (component, event), value in sorted(gauges.items()):
+            lines.append(f'wallet_cache_entries{{{_labels(component=component, kind=event)}}} {value}')
+        
+        # Outbound HTTP is always timed by HttpClient; merge every live client
+        upstreams: Dict[str, Dict] = {}
+        for client in live_clients():
+            for upstream, stats in client.latency_stats().items():
+                merged = upstreams.get(upstream)
+                if merged is None:
+                    upstreams[upstream] = stats
+                    continue
+                merged['count'] += stats['count']
+                merged['sum_ms'] += stats['sum_ms']
+                merged['errors'] += stats['errors']
+                for bound, count in stats['buckets'].items():
+                    merged['buckets'][bound] = merged['buckets'].get(bound, 0) + count
+        lines += [
+            '# HELP wallet_http_request_duration_seconds Outbound HTTP request latency by upstream',
+            '# TYPE wallet_http_request_duration_seconds histogram'
+        ]
+        for upstream, stats in sorted(upstreams.items()):
+            _render_histogram(lines, 'wallet_http_request_duration_seconds', _labels(upstream=upstream), stats)
+        lines += [
+            '# HELP wallet_http_request_errors_total Outbound HTTP requests that failed to connect or time out',
+            '# TYPE wallet_http_request_errors_total counter'
+        ]
+        for upstream, stats in sorted(upstreams.items()):
+            lines.append(f'wallet_http_request_errors_total{{{_labels(upstream=upstream)}}} {stats["errors"]}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve GET /metrics from a daemon thread (one server per process)"""
+        if self._server is not None:
+            return self._server
+        registry = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="metrics-server").start()
+        print(f"[Metrics] Serving Prometheus metrics on http://{host}:{self._server.server_port}/metrics")
+        return self._server
+
+# Process-wide registry
+metrics = Metrics()
+instrument = metrics.instrument
+
+def metrics_from_env():
+    """Enable metrics and serve them on METRICS_PORT, if set"""
+    port = os.getenv('METRICS_PORT')
+    if port:
+        metrics.enable()
+        metrics.serve(int(port), os.getenv('METRICS_HOST', '127.0.0.1'))
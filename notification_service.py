@@ -1,15 +1,16 @@
 import os
-import requests
 from typing import Optional
 from dotenv import load_dotenv
+from http_client import HttpClient, http_client as shared_http_client
 
 load_dotenv()
 
 class NotificationService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        self.http = http_client or shared_http_client
         self.api_key = os.getenv('RESEND_API_KEY', 're_2zf9B1g1_BeW763EyYQjH5v9e5pKmCzDH')
         self.from_email = os.getenv('FROM_EMAIL', 'onboarding@resend.dev')  # ← Changed default
-        self.base_url = "https://api.resend.com/emails"
+        self.base_url = os.getenv('RESEND_API_URL', 'https://api.resend.com/emails')
     
         # Debug: Print to verify API key is loaded (remove in production)
         print(f"[NotificationService] API Key loaded: {self.api_key[:10]}..." if len(self.api_key) > 10 else "[NotificationService] ⚠️ Using default API key")
@@ -110,11 +111,11 @@ class NotificationService:
                 'text': text_content
             }
 
-            response = requests.post(
+            response = self.http.post(
                 self.base_url,
+                upstream="resend",
                 json=data,
-                headers=headers,
-                timeout=10
+                headers=headers
             )
 
             if response.status_code in (200, 202):  # 202 = accepted, 200 = OK
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from database import DatabaseManager
+from notification_service import NotificationService
+
+class OutboxWorker:
+    """Background pool that drains the notification outbox with retries and dead-lettering"""
+    
+    def __init__(self, db: DatabaseManager, notification_service: NotificationService,
+                 workers: int = 2, batch_size: int = 16, poll_interval: float = 0.5,
+                 max_attempts: int = 5, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 lease_seconds: float = 60.0):
+        self.db = db
+        self.notification_service = notification_service
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # Must exceed the slowest send (the Resend timeout), or a row could be sent twice
+        self.lease_seconds = lease_seconds
+        
+        self._stop = threading.Event()
+        self._poller = None
+        self._executor = None
+    
+    def start(self):
+        """Start polling the outbox in the background"""
+        if self._poller is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox")
+        self._poller = threading.Thread(target=self._poll_loop, name="outbox-poller", daemon=True)
+        self._poller.start()
+    
+    def stop(self, wait: bool = True):
+        """Stop polling; in-flight sends finish if wait is True"""
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+    
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.db.claim_notifications(self.batch_size, self.lease_seconds)
+            except Exception as e:
+                print(f"[OutboxWorker] ❗ Claim error: {str(e)}")
+                claimed = []
+            
+            if claimed:
+                # Wait for the batch so the pool never holds more than one batch of leases
+                for future in [self._executor.submit(self._deliver, item) for item in claimed]:
+                    future.result()
+            else:
+                self._stop.wait(self.poll_interval)
+    
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff delay after the given number of failed attempts"""
+        return min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+    
+    def _deliver(self, item: Dict):
+        """Send one outbox item and record the outcome"""
+        attempts = item['attempts'] + 1
+        try:
+            if item['kind'] == 'transaction':
+                sent = self.notification_service.send_transaction_notification(**item['payload'])
+                error = None if sent else "Email provider rejected the notification"
+            else:
+                sent, error = False, f"Unknown notification kind: {item['kind']}"
+                attempts = self.max_attempts  # Retrying will not help
+        except Exception as e:
+            sent, error = False, str(e)
+        
+        try:
+            if sent:
+                self.db.complete_notification(item['id'])
+            elif attempts >= self.max_attempts:
+                print(f"[OutboxWorker] ❌ Dead-lettered notification {item['id']}: {error}")
+                self.db.fail_notification(item['id'], error)
+            else:
+                self.db.fail_notification(item['id'], error, time.time() + self._backoff(attempts))
+        except Exception as e:
+            # The lease expires and the item is retried
+            print(f"[OutboxWorker] ❗ Could not record outcome for notification {item['id']}: {str(e)}")
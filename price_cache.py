@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Tuple
+from dotenv import load_dotenv
+from metrics import metrics
+
+load_dotenv()
+
+class PriceCache:
+    """Process-wide TTL cache with stale-while-revalidate and single-flight refreshes"""
+    
+    def __init__(self, ttl: float = 30.0, stale_ttl: float = 300.0):
+        # Values younger than `ttl` are fresh; for a further `stale_ttl` seconds
+        # they are still served while one background refresh runs
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[str, Tuple[float, float]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'refreshes': 0,
+            'refresh_errors': 0
+        }
+        metrics.track_stats('price_cache', self)
+    
+    def get(self, key: str, fetch: Callable[[], float]) -> float:
+        """Return the cached value for key, calling fetch at most once per refresh"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._stats['hits'] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    # Serve stale and revalidate in the background
+                    self._stats['stale_hits'] += 1
+                    if key not in self._inflight:
+                        future = Future()
+                        self._inflight[key] = future
+                        threading.Thread(
+                            target=self._refresh, args=(key, fetch, future), daemon=True
+                        ).start()
+                    return value
+            
+            # Miss: the first caller fetches, concurrent callers wait for its result
+            self._stats['misses'] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._stats['coalesced'] += 1
+        
+        if leader:
+            self._refresh(key, fetch, future)
+        return future.result()
+    
+    def put(self, key: str, value: float):
+        """Store a value fetched elsewhere (e.g. by an async client) as fresh"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+    
+    def _refresh(self, key: str, fetch: Callable[[], float], future: Future):
+        """Fetch a new value, store it and wake everyone waiting on it"""
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._stats['refreshes'] += 1
+                self._stats['refresh_errors'] += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._entries[key] = (value, time.monotonic())
+            self._inflight.pop(key, None)
+        future.set_result(value)
+    
+    def invalidate(self, key: str):
+        """Drop a cached value so the next get fetches it again"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def stats(self) -> Dict:
+        """Hit/miss/staleness counters for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+# Shared by every WalletService in the process so all sessions reuse one price
+price_cache = PriceCache(
+    ttl=float(os.getenv('PRICE_CACHE_TTL', '30')),
+    stale_ttl=float(os.getenv('PRICE_CACHE_STALE_TTL', '300'))
+)
@@ -0,0 +1,123 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from metrics import metrics
+
+class QuoteEngine:
+    """Reuses recent routed ETH/USD rates so small quotes are priced locally"""
+    
+    def __init__(self, fetch_quote: Callable[[float], Dict], ttl: float = 15.0,
+                 max_entries: int = 64, fresh_quote_threshold_usd: float = 1000.0):
+        # fetch_quote(usd_amount) returns a quote dict as built by
+        # WalletService._fetch_usd_to_eth_quote
+        self.fetch_quote = fetch_quote
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Amounts above this always get a fresh routed quote (price impact matters)
+        self.fresh_quote_threshold_usd = fresh_quote_threshold_usd
+        # Size bucket -> (rate, fetched_at), least recently used first
+        self._rates: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'cached_quotes': 0,
+            'routed_quotes': 0,
+            'evictions': 0
+        }
+        metrics.track_stats('quote_engine', self, gauges=('cached_rates',))
+    
+    @staticmethod
+    def _bucket(usd_amount: float) -> int:
+        """Size tier for a USD amount (powers of two), since routed rates vary with size"""
+        return int(math.log2(usd_amount)) if usd_amount >= 1 else 0
+    
+    def _cached_rate(self, usd_amount: float) -> Optional[float]:
+        """Freshest usable rate for this amount: same size tier, else any small tier"""
+        now = time.monotonic()
+        bucket = self._bucket(usd_amount)
+        with self._lock:
+            entry = self._rates.get(bucket)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._rates.move_to_end(bucket)
+                return entry[0]
+            
+            # Fall back to the most recently fetched rate from any tier at or below
+            # the threshold; every such tier is priced off the same rate anyway
+            threshold_bucket = self._bucket(self.fresh_quote_threshold_usd)
+            best = None
+            for other, (rate, fetched_at) in self._rates.items():
+                if other <= threshold_bucket and now - fetched_at < self.ttl:
+                    if best is None or fetched_at > best[1]:
+                        best = (rate, fetched_at)
+            return best[0] if best else None
+    
+    def _store_rate(self, usd_amount: float, rate: float):
+        """Remember a routed rate for the amount's size tier, evicting the LRU tier"""
+        bucket = self._bucket(usd_amount)
+        with self._lock:
+            self._rates[bucket] = (rate, time.monotonic())
+            self._rates.move_to_end(bucket)
+            while len(self._rates) > self.max_entries:
+                self._rates.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def _cached_quote(self, usd_amount: float) -> Optional[Dict]:
+        """Quote priced from a cached rate, or None if a routed quote is needed"""
+        if usd_amount <= self.fresh_quote_threshold_usd:
+            rate = self._cached_rate(usd_amount)
+            if rate:
+                with self._lock:
+                    self._stats['cached_quotes'] += 1
+                return {
+                    'success': True,
+                    'eth_amount': usd_amount / rate,
+                    'usd_amount': usd_amount,
+                    'rate': rate,
+                    'cached': True
+                }
+        return None
+    
+    def _record_quote(self, usd_amount: float, quote: Dict) -> Dict:
+        """Count a routed quote and cache its rate"""
+        with self._lock:
+            self._stats['routed_quotes'] += 1
+        # Only cache real routed rates, never the price-feed fallback
+        if quote.get('success') and not quote.get('fallback') and quote.get('rate'):
+            self._store_rate(usd_amount, quote['rate'])
+        return quote
+    
+    def quote(self, usd_amount: float) -> Dict:
+        """Quote ETH for a USD amount, from the cached rate when possible"""
+        cached = self._cached_quote(usd_amount)
+        if cached is not None:
+            return cached
+        return self._record_quote(usd_amount, self.fetch_quote(usd_amount))
+    
+    async def aquote(self, usd_amount: float, fetch_quote: Callable[[float], Awaitable[Dict]]) -> Dict:
+        """quote() for asyncio callers: routed quotes come from the awaitable fetch_quote"""
+        cached = self._cached_quote(usd_amount)
+        if cached is not None:
+            return cached
+        return self._record_quote(usd_amount, await fetch_quote(usd_amount))
+    
+    def clear(self):
+        """Forget every cached rate"""
+        with self._lock:
+            self._rates.clear()
+    
+    def stats(self) -> Dict:
+        """Cached vs routed quote counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_rates'] = len(self._rates)
+        return stats
+
+def quote_engine_from_env(fetch_quote: Callable[[float], Dict]) -> QuoteEngine:
+    """Build a QuoteEngine configured from QUOTE_CACHE_TTL / QUOTE_FRESH_THRESHOLD_USD"""
+    return QuoteEngine(
+        fetch_quote,
+        ttl=float(os.getenv('QUOTE_CACHE_TTL', '15')),
+        fresh_quote_threshold_usd=float(os.getenv('QUOTE_FRESH_THRESHOLD_USD', '1000'))
+    )
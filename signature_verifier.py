@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+def recover_signer(message: str, signature: str) -> Optional[str]:
+    """Recover the lower-cased signer address, or None if the signature is malformed"""
+    try:
+        return Account.recover_message(encode_defunct(text=message), signature=signature).lower()
+    except Exception:
+        return None
+
+def _recover_chunk(chunk: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """Recover a chunk of (message, signature) pairs (runs in a worker process)"""
+    return [recover_signer(message, signature) for message, signature in chunk]
+
+class SignatureVerifier:
+    """ECDSA signature verification with an LRU of recovered signers and a process pool for batches"""
+    
+    def __init__(self, cache_size: int = 10000, workers: Optional[int] = None,
+                 chunk_size: int = 64):
+        self.cache_size = cache_size
+        self.workers = workers
+        # Batches no larger than one chunk are verified inline; IPC would cost more
+        self.chunk_size = chunk_size
+        # (message, signature) -> recovered address, least recently used first
+        self._recovered: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stats = {'hits': 0, 'misses': 0}
+    
+    def _cached(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            signer = self._recovered.get(key)
+            if signer is not None:
+                self._recovered.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+            return signer
+    
+    def _remember(self, key: Tuple[str, str], signer: str):
+        with self._lock:
+            self._recovered[key] = signer
+            self._recovered.move_to_end(key)
+            while len(self._recovered) > self.cache_size:
+                self._recovered.popitem(last=False)
+    
+    def verify(self, address: str, message: str, signature: str) -> bool:
+        """Verify one signature"""
+        key = (message, signature)
+        signer = self._cached(key)
+        if signer is None:
+            signer = recover_signer(message, signature)
+            if signer is None:
+                return False
+            self._remember(key, signer)
+        return signer == address.lower()
+    
+    def verify_batch(self, batch: List[Dict]) -> List[bool]:
+        """Verify many {'address', 'message', 'signature'} items, fanning misses out to the pool"""
+        signers: List[Optional[str]] = [None] * len(batch)
+        pending = []
+        for i, item in enumerate(batch):
+            signer = self._cached((item['message'], item['signature']))
+            if signer is None:
+                pending.append(i)
+            else:
+                signers[i] = signer
+        
+        pairs = [(batch[i]['message'], batch[i]['signature']) for i in pending]
+        if len(pairs) <= self.chunk_size:
+            recovered = _recover_chunk(pairs)
+        else:
+            chunks = [pairs[i:i + self.chunk_size] for i in range(0, len(pairs), self.chunk_size)]
+            recovered = [signer for chunk in self._get_pool().map(_recover_chunk, chunks)
+                         for signer in chunk]
+        
+        for i, pair, signer in zip(pending, pairs, recovered):
+            signers[i] = signer
+            if signer is not None:
+                self._remember(pair, signer)
+        
+        return [
+            signer is not None and signer == item['address'].lower()
+            for item, signer in zip(batch, signers)
+        ]
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Create the worker pool on first use and keep it for later batches"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+    
+    def stats(self) -> Dict:
+        """Cache hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._recovered)
+        return stats
+    
+    def close(self):
+        """Shut down the worker pool"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
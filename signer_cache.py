@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+from eth_account import Account
+from eth_account.hdaccount import ETHEREUM_DEFAULT_PATH
+from eth_account.signers.local import LocalAccount
+from hd_wallet import ETHEREUM_ACCOUNT_PARENT_PATH, HDKeychain
+
+class SignerCache:
+    """In-memory cache of keys derived from mnemonics, with TTL and explicit eviction
+    
+    Each mnemonic gets one HDKeychain (seed computed once) plus the accounts
+    derived from it, all dropped together on expiry or eviction.
+    """
+    
+    def __init__(self, ttl: float = 900.0, max_entries: int = 1024):
+        self.ttl = ttl
+        # Maximum number of mnemonics held at once
+        self.max_entries = max_entries
+        # mnemonic hash -> {'keychain', 'accounts': {path: account}, 'expires_at'}, LRU first
+        self._wallets: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        # Required for Account.from_mnemonic
+        Account.enable_unaudited_hdwallet_features()
+    
+    @staticmethod
+    def _key(mnemonic: str) -> str:
+        """Cache key: a hash, so the mnemonic itself is never kept as a dict key"""
+        return hashlib.sha256(mnemonic.encode()).hexdigest()
+    
+    def _wallet(self, mnemonic: str) -> Dict:
+        """Cached keychain and accounts for a mnemonic, computing the seed on a miss"""
+        key = self._key(mnemonic)
+        with self._lock:
+            entry = self._wallets.get(key)
+            if entry is not None and entry['expires_at'] > time.monotonic():
+                self._wallets.move_to_end(key)
+                return entry
+        
+        # Derive outside the lock; a concurrent miss just derives twice
+        entry = {
+            'keychain': HDKeychain(mnemonic),
+            'accounts': {},
+            'expires_at': time.monotonic() + self.ttl
+        }
+        with self._lock:
+            self._wallets[key] = entry
+            self._wallets.move_to_end(key)
+            while len(self._wallets) > self.max_entries:
+                self._wallets.popitem(last=False)
+                self._stats['evictions'] += 1
+        return entry
+    
+    def get(self, mnemonic: str, account_path: str = ETHEREUM_DEFAULT_PATH) -> LocalAccount:
+        """Return the derived account, running BIP39/BIP32 derivation only on a miss"""
+        entry = self._wallet(mnemonic)
+        with self._lock:
+            account = entry['accounts'].get(account_path)
+            self._stats['hits' if account is not None else 'misses'] += 1
+        if account is not None:
+            return account
+        
+        keychain = entry['keychain']
+        parent_path, _, index = account_path.rpartition('/')
+        if parent_path == keychain.parent_path and index.isdigit():
+            account = keychain.account(int(index))
+        else:
+            account = Account.from_mnemonic(mnemonic, account_path=account_path)
+        with self._lock:
+            entry['accounts'][account_path] = account
+        return account
+    
+    def get_account(self, mnemonic: str, index: int = 0) -> LocalAccount:
+        """Return account `index` under m/44'/60'/0'/0"""
+        return self.get(mnemonic, f"{ETHEREUM_ACCOUNT_PARENT_PATH}/{index}")
+    
+    def keychain(self, mnemonic: str) -> HDKeychain:
+        """Return the cached keychain for a mnemonic"""
+        return self._wallet(mnemonic)['keychain']
+    
+    def evict(self, mnemonic: str):
+        """Drop every key derived from a mnemonic (e.g. when a wallet disconnects)"""
+        with self._lock:
+            self._wallets.pop(self._key(mnemonic), None)
+    
+    def clear(self):
+        """Drop every derived key from memory"""
+        with self._lock:
+            self._wallets.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._wallets)
+        return stats
+
+def signer_cache_from_env() -> SignerCache:
+    """Build a SignerCache configured from SIGNER_CACHE_TTL"""
+    return SignerCache(ttl=float(os.getenv('SIGNER_CACHE_TTL', '900')))
@@ -0,0 +1,256 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Paths served, matching the real APIs' paths under their base URLs
+ROUTES = {
+    ('GET', '/api/v3/simple/price'): 'coingecko',
+    ('POST', '/v2/fungible/msgs_direct'): 'skip',
+    ('POST', '/emails'): 'resend'
+}
+UPSTREAMS = ('coingecko', 'skip', 'resend')
+
+class LatencyModel:
+    """Random response delay in milliseconds, parsed from a spec string
+    
+    Specs: fixed:MS, uniform:LO:HI, normal:MEAN:STD, exponential:MEAN,
+    lognormal:MEDIAN:SIGMA. Samples are never negative.
+    """
+    
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'exponential': 1, 'lognormal': 2}
+    
+    def __init__(self, spec: str = "fixed:0"):
+        kind, *args = spec.split(':')
+        if kind not in self.KINDS or len(args) != self.KINDS[kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}")
+        self.kind = kind
+        self.args = [float(arg) for arg in args]
+        self.spec = spec
+    
+    def sample_ms(self, rng: random.Random) -> float:
+        a = self.args
+        if self.kind == 'fixed':
+            value = a[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(a[0], a[1])
+        elif self.kind == 'normal':
+            value = rng.gauss(a[0], a[1])
+        elif self.kind == 'exponential':
+            value = rng.expovariate(1 / a[0]) if a[0] > 0 else 0.0
+        else:
+            value = a[0] * math.exp(rng.gauss(0, a[1]))
+        return max(0.0, value)
+
+class PriceModel:
+    """ETH/USD price following a geometric random walk in wall-clock time"""
+    
+    def __init__(self, start_price: float = 3000.0, volatility: float = 0.0,
+                 rng: Optional[random.Random] = None):
+        # volatility: standard deviation of log-returns per sqrt(second)
+        self.price = start_price
+        self.volatility = volatility
+        self.rng = rng or random.Random()
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def current(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            if self.volatility and elapsed > 0:
+                self.price *= math.exp(self.rng.gauss(0, self.volatility * math.sqrt(elapsed)))
+            return self.price
+
+class StubServer:
+    """Local stand-in for CoinGecko, Skip and Resend with injected latency and errors
+    
+    Point the wallet at it with COINGECKO_API_URL, SKIP_API_URL and
+    RESEND_API_URL (see env()). GET /_stub/stats returns per-upstream counters.
+    """
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: Optional[Dict[str, str]] = None,
+                 error_rate: Optional[Dict[str, float]] = None,
+                 start_price: float = 3000.0, volatility: float = 0.0,
+                 price_impact_bps: float = 0.0, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.latency = {name: LatencyModel((latency or {}).get(name, "fixed:0")) for name in UPSTREAMS}
+        self.error_rate = {name: float((error_rate or {}).get(name, 0.0)) for name in UPSTREAMS}
+        self.prices = PriceModel(start_price, volatility, random.Random(seed))
+        # Skip quotes lose this many basis points per $1M routed
+        self.price_impact_bps = price_impact_bps
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {name: {'requests': 0, 'errors': 0} for name in UPSTREAMS}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the wallet services at this server"""
+        return {
+            'COINGECKO_API_URL': f"{self.url}/api/v3",
+            'SKIP_API_URL': f"{self.url}/v2/fungible/msgs_direct",
+            'RESEND_API_URL': f"{self.url}/emails"
+        }
+    
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name="stub-server")
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+    
+    def serve_forever(self):
+        self._server.serve_forever()
+    
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+        stats['eth_usd'] = self.prices.current()
+        return stats
+    
+    def _respond(self, upstream: str, body: Dict) -> tuple:
+        """Sleep for the upstream's latency, then return (status, response body)"""
+        with self._rng_lock:
+            delay_ms = self.latency[upstream].sample_ms(self.rng)
+            failed = self.rng.random() < self.error_rate[upstream]
+        time.sleep(delay_ms / 1000)
+        
+        with self._stats_lock:
+            self._stats[upstream]['requests'] += 1
+            if failed:
+                self._stats[upstream]['errors'] += 1
+        if failed:
+            return 503, {'error': 'injected upstream failure'}
+        
+        price = self.prices.current()
+        if upstream == 'coingecko':
+            return 200, {'ethereum': {'usd': round(price, 2)}}
+        if upstream == 'skip':
+            usd_amount = int(body.get('amount_in', 0)) / 1_000_000
+            impact = self.price_impact_bps / 10_000 * usd_amount / 1_000_000
+            amount_out = int(usd_amount / price * (1 - impact) * 10**18)
+            return 200, {
+                'msgs': [],
+                'txs': [],
+                'route': {
+                    'amount_in': body.get('amount_in'),
+                    'amount_out': str(amount_out),
+                    'source_asset_denom': body.get('source_asset_denom'),
+                    'dest_asset_denom': body.get('dest_asset_denom')
+                },
+                'amount_out': str(amount_out)
+            }
+        return 200, {'id': str(uuid.uuid4())}
+    
+    def _handler_class(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def _send(self, status: int, body: Dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def _route(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                path = urlparse(self.path).path
+                
+                if method == 'GET' and path == '/_stub/stats':
+                    return self._send(200, stub.stats())
+                upstream = ROUTES.get((method, path))
+                if upstream is None:
+                    return self._send(404, {'error': f"no stub for {method} {path}"})
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    return self._send(400, {'error': 'invalid JSON body'})
+                self._send(*stub._respond(upstream, body))
+            
+            def do_GET(self):
+                self._route('GET')
+            
+            def do_POST(self):
+                self._route('POST')
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+def _per_upstream(values, convert) -> Dict:
+    """Parse NAME=VALUE options (a bare VALUE applies to every upstream)"""
+    parsed = {}
+    for value in values or []:
+        name, sep, setting = value.partition('=')
+        if not sep:
+            parsed.update({upstream: convert(value) for upstream in UPSTREAMS})
+        elif name in UPSTREAMS:
+            parsed[name] = convert(setting)
+        else:
+            raise ValueError(f"Unknown upstream {name!r} (expected one of {', '.join(UPSTREAMS)})")
+    return parsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the CoinGecko, Skip and Resend APIs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', action='append', metavar='[UPSTREAM=]SPEC',
+                        help='e.g. skip=lognormal:120:0.6 or fixed:20 '
+                             '(fixed/uniform/normal/exponential/lognormal, in ms)')
+    parser.add_argument('--error-rate', action='append', metavar='[UPSTREAM=]RATE',
+                        help='fraction of requests answered with HTTP 503, e.g. resend=0.05')
+    parser.add_argument('--price', type=float, default=3000.0, help='starting ETH/USD price')
+    parser.add_argument('--volatility', type=float, default=0.0,
+                        help='price drift: std-dev of log-returns per sqrt(second), e.g. 0.001')
+    parser.add_argument('--price-impact-bps', type=float, default=0.0,
+                        help='Skip quote price impact in basis points per $1M')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    
+    server = StubServer(
+        args.host, args.port,
+        latency=_per_upstream(args.latency, str),
+        error_rate=_per_upstream(args.error_rate, float),
+        start_price=args.price,
+        volatility=args.volatility,
+        price_impact_bps=args.price_impact_bps,
+        seed=args.seed
+    )
+    print(f"[StubServer] Listening on {server.url}; point the wallet at it with:")
+    for name, value in server.env().items():
+        print(f"{name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
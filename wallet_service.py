@@ -1,18 +1,46 @@
+import itertools
 import os
 import random
 import time
-import requests
 from eth_account import Account
 from eth_account.messages import encode_defunct
 from mnemonic import Mnemonic
+from batch_payout import CURRENCIES, commit_legs, payout_message
 from database import DatabaseManager
+from ledger_export import export_transactions
+from metrics import instrument
+from http_client import HttpClient, http_client as shared_http_client
+from price_cache import PriceCache, price_cache as shared_price_cache
+from quote_engine import QuoteEngine, quote_engine_from_env
+from signer_cache import SignerCache, signer_cache_from_env
+from signature_verifier import SignatureVerifier
 from utils import validate_ethereum_address, wei_to_eth, eth_to_wei
 import json
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, List, Optional, Tuple
 
+def _derive_new_wallet(_: int) -> Tuple[str, str]:
+    """Generate a mnemonic and derive its address (runs in a worker process)"""
+    Account.enable_unaudited_hdwallet_features()
+    mnemonic = Mnemonic("english").generate(strength=128)
+    return mnemonic, Account.from_mnemonic(mnemonic).address
+
+@instrument("wallet_service")
 class WalletService:
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, price_cache: Optional[PriceCache] = None,
+                 quote_engine: Optional[QuoteEngine] = None,
+                 http_client: Optional[HttpClient] = None,
+                 signer_cache: Optional[SignerCache] = None,
+                 signature_verifier: Optional[SignatureVerifier] = None):
         self.db = db
+        self.signature_verifier = signature_verifier or SignatureVerifier()
+        self.signer_cache = signer_cache or signer_cache_from_env()
+        self.http = http_client or shared_http_client
+        self.price_cache = price_cache or shared_price_cache
+        self.quote_engine = quote_engine or quote_engine_from_env(self._fetch_usd_to_eth_quote)
+        # Upstream endpoints, overridable to point at stub_server.py or a proxy
+        self.coingecko_url = os.getenv('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3').rstrip('/')
+        self.skip_url = os.getenv('SKIP_API_URL', 'https://api.skip.build/v2/fungible/msgs_direct')
         self.mnemo = Mnemonic("english")
         # Enable HD wallet features (required for mnemonic support)
         Account.enable_unaudited_hdwallet_features()
@@ -22,8 +50,8 @@ class WalletService:
         # Generate 12-word mnemonic
         mnemonic = self.mnemo.generate(strength=128)
         
-        # Derive Ethereum address
-        account = Account.from_mnemonic(mnemonic)
+        # Derive Ethereum address (kept in the signer cache for the first signature)
+        account = self.signer_cache.get(mnemonic)
         address = account.address
         
         # Initialize wallet in database with random balance (1-10 ETH)
@@ -32,81 +60,135 @@ class WalletService:
         
         return mnemonic, address
     
-    def import_wallet(self, mnemonic: str) -> str:
-        """Import wallet from mnemonic phrase"""
+    def create_wallets(self, count: int, workers: Optional[int] = None,
+                       chunksize: int = 16, insert_batch: int = 1000) -> List[Tuple[str, str]]:
+        """Create `count` wallets, deriving keys across a process pool
+        
+        Every `insert_batch` derived wallets are inserted with one executemany, so
+        the write lock is only held for the insert, never during derivation.
+        Returns (mnemonic, address) pairs.
+        """
+        created = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_derive_new_wallet, range(count), chunksize=chunksize)
+            while True:
+                chunk = list(itertools.islice(results, insert_batch))
+                if not chunk:
+                    break
+                self.db.create_wallets([(address, random.uniform(1.0, 10.0)) for _, address in chunk])
+                created.extend(chunk)
+        
+        return created
+    
+    def import_wallet(self, mnemonic: str, scan_accounts: int = 1) -> Tuple[str, int]:
+        """Import wallet from mnemonic phrase; returns (address, account_index)
+        
+        Scans accounts m/44'/60'/0'/0/0 .. scan_accounts-1 and returns the first
+        one already in the database; if none is, account 0 is created. Pass the
+        account_index to sign_message.
+        """
         if not self.mnemo.check(mnemonic):
             raise ValueError("Invalid mnemonic phrase")
         
-        # Derive Ethereum address
-        account = Account.from_mnemonic(mnemonic)
-        address = account.address
+        existing = self.find_existing_accounts(mnemonic, max(1, scan_accounts))
+        if existing:
+            return existing[0]['address'], existing[0]['index']
         
-        # Check if wallet exists in database, create if not
-        if not self.db.get_wallet(address):
-            initial_balance = random.uniform(1.0, 10.0)
-            self.db.create_wallet(address, initial_balance)
+        # Derive Ethereum address (kept in the signer cache for the first signature)
+        address = self.signer_cache.get_account(mnemonic, 0).address
+        initial_balance = random.uniform(1.0, 10.0)
+        self.db.create_wallet(address, initial_balance)
         
-        return address
+        return address, 0
+    
+    def derive_accounts(self, mnemonic: str, count: int, start: int = 0) -> List[Dict]:
+        """Derive accounts start .. start+count-1 with a single seed computation"""
+        keychain = self.signer_cache.keychain(mnemonic)
+        return [
+            {'index': index, 'address': account.address, 'path': keychain.path(index)}
+            for index, account in keychain.accounts(count, start)
+        ]
+    
+    def find_existing_accounts(self, mnemonic: str, scan_accounts: int = 20) -> List[Dict]:
+        """Accounts among the first `scan_accounts` indexes that already have a wallet"""
+        accounts = self.derive_accounts(mnemonic, scan_accounts)
+        wallets = self.db.get_wallets([account['address'] for account in accounts])
+        return [account for account in accounts if account['address'] in wallets]
     
     def get_balance(self, address: str) -> float:
         """Get wallet balance"""
-        wallet = self.db.get_wallet(address)
-        return wallet['balance'] if wallet else 0.0
+        balance = self.db.get_balance(address)
+        return balance if balance is not None else 0.0
     
     def get_eth_price_usd(self) -> float:
-        """Get current ETH price in USD using a simple API"""
+        """Get current ETH price in USD (cached, see price_cache.py)"""
         try:
-            # Using CoinGecko API as fallback for price display
-            response = requests.get(
-                "https://api.coingecko.com/api/v3/simple/price",
-                params={"ids": "ethereum", "vs_currencies": "usd"},
-                timeout=5
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return float(data['ethereum']['usd'])
-            else:
-                return 3000.0  # Fallback price
+            return self.price_cache.get('ethereum:usd', self._fetch_eth_price_usd)
         except Exception:
             return 3000.0  # Fallback price
     
+    def _fetch_eth_price_usd(self) -> float:
+        """Fetch the ETH price in USD from CoinGecko"""
+        # Using CoinGecko API as fallback for price display
+        response = self.http.get(
+            f"{self.coingecko_url}/simple/price",
+            upstream="coingecko",
+            params={"ids": "ethereum", "vs_currencies": "usd"}
+        )
+        if response.status_code != 200:
+            raise ValueError(f"CoinGecko returned HTTP {response.status_code}")
+        data = response.json()
+        return float(data['ethereum']['usd'])
+    
     def get_usd_to_eth_quote(self, usd_amount: float) -> Dict:
-        """Get ETH equivalent for USD amount using Skip API"""
+        """Get ETH equivalent for USD amount (recent Skip rate reused for small amounts)"""
+        return self.quote_engine.quote(usd_amount)
+    
+    @staticmethod
+    def _skip_quote_payload(usd_amount: float) -> Dict:
+        """Skip msgs_direct request routing `usd_amount` USDC to native ETH"""
+        # Convert USD to USDC amount (6 decimals)
+        usdc_amount = str(int(usd_amount * 1_000_000))
+        return {
+            "source_asset_denom": "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48",
+            "source_asset_chain_id": "1",
+            "dest_asset_denom": "ethereum-native",
+            "dest_asset_chain_id": "1",
+            "amount_in": usdc_amount,
+            "chain_ids_to_addresses": {
+                "1": "0x742d35Cc6634C0532925a3b8D4C9db96c728b0B4"
+            },
+            "slippage_tolerance_percent": "1",
+            "smart_swap_options": {
+                "evm_swaps": True
+            },
+            "allow_unsafe": False
+        }
+    
+    @staticmethod
+    def _quote_from_skip(usd_amount: float, data: Dict) -> Dict:
+        """Quote dict from a successful Skip response"""
+        # Extract ETH amount from response (18 decimals)
+        eth_amount_wei = int(data['amount_out'])
+        eth_amount = wei_to_eth(eth_amount_wei)
+        
+        return {
+            'success': True,
+            'eth_amount': eth_amount,
+            'usd_amount': usd_amount,
+            'rate': usd_amount / eth_amount if eth_amount > 0 else 0
+        }
+    
+    def _fetch_usd_to_eth_quote(self, usd_amount: float) -> Dict:
+        """Get a routed ETH quote for a USD amount from the Skip API"""
         try:
-            # Convert USD to USDC amount (6 decimals)
-            usdc_amount = str(int(usd_amount * 1_000_000))
-            
-            url = "https://api.skip.build/v2/fungible/msgs_direct"
-            payload = {
-                "source_asset_denom": "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48",
-                "source_asset_chain_id": "1",
-                "dest_asset_denom": "ethereum-native",
-                "dest_asset_chain_id": "1",
-                "amount_in": usdc_amount,
-                "chain_ids_to_addresses": {
-                    "1": "0x742d35Cc6634C0532925a3b8D4C9db96c728b0B4"
-                },
-                "slippage_tolerance_percent": "1",
-                "smart_swap_options": {
-                    "evm_swaps": True
-                },
-                "allow_unsafe": False
-            }
+            url = self.skip_url
+            payload = self._skip_quote_payload(usd_amount)
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.http.post(url, upstream="skip", json=payload)
             
             if response.status_code == 200:
-                data = response.json()
-                # Extract ETH amount from response (18 decimals)
-                eth_amount_wei = int(data['amount_out'])
-                eth_amount = wei_to_eth(eth_amount_wei)
-                
-                return {
-                    'success': True,
-                    'eth_amount': eth_amount,
-                    'usd_amount': usd_amount,
-                    'rate': usd_amount / eth_amount if eth_amount > 0 else 0
-                }
+                return self._quote_from_skip(usd_amount, response.json())
             else:
                 # Fallback to simple calculation
                 eth_price = self.get_eth_price_usd()
@@ -138,9 +220,25 @@ class WalletService:
                     'error': f"Quote failed: {str(e)}. Fallback failed: {str(fallback_error)}"
                 }
     
+    @staticmethod
+    def transaction_message(from_address: str, to_address: str, amount_eth: float,
+                            usd_amount: Optional[float] = None, nonce: Optional[str] = None) -> str:
+        """The message a transfer is signed over; execute_transaction rebuilds and compares it"""
+        if usd_amount:
+            message = f"Transfer {amount_eth:.6f} ETH (${usd_amount:.2f} USD) to {to_address} from {from_address}"
+        else:
+            message = f"Transfer {amount_eth:.6f} ETH to {to_address} from {from_address}"
+        if nonce:
+            message += f" nonce {nonce}"
+        return message
+    
     def prepare_transaction(self, from_address: str, to_address: str, 
-                          amount: float, currency: str) -> Dict:
-        """Prepare transaction for signing"""
+                          amount: float, currency: str, quote: Optional[Dict] = None,
+                          nonce: Optional[str] = None) -> Dict:
+        """Prepare transaction for signing (pass `quote` to use an already fetched USD quote)
+        
+        A `nonce` is included in the message, making its signature specific to this request.
+        """
         if not validate_ethereum_address(to_address):
             raise ValueError("Invalid recipient address")
         
@@ -155,11 +253,10 @@ class WalletService:
             usd_amount = None
             eth_price = None
             
-            message = f"Transfer {eth_amount:.6f} ETH to {to_address} from {from_address}"
-            
         else:  # USD
             # Get ETH equivalent
-            quote = self.get_usd_to_eth_quote(amount)
+            if quote is None:
+                quote = self.get_usd_to_eth_quote(amount)
             if not quote['success']:
                 raise ValueError(quote['error'])
             
@@ -170,8 +267,6 @@ class WalletService:
             
             usd_amount = amount
             eth_price = quote['rate']
-            
-            message = f"Transfer {eth_amount:.6f} ETH (${usd_amount:.2f} USD) to {to_address} from {from_address}"
         
         return {
             'from_address': from_address,
@@ -180,69 +275,215 @@ class WalletService:
             'amount_usd': usd_amount,
             'original_usd_amount': amount if currency == "USD" else None,
             'original_eth_price': eth_price,
-            'message': message,
+            'message': self.transaction_message(from_address, to_address, eth_amount, usd_amount, nonce),
+            'nonce': nonce,
             'created_at': time.time()
         }
     
-    def sign_message(self, mnemonic: str, message: str) -> str:
-        """Sign a message with the wallet's private key"""
-        account = Account.from_mnemonic(mnemonic)
+    def sign_message(self, mnemonic: str, message: str, account_index: int = 0) -> str:
+        """Sign a message with the private key of account `account_index`"""
+        account = self.signer_cache.get_account(mnemonic, account_index)
         signable_message = encode_defunct(text=message)
         signed_message = account.sign_message(signable_message)
         return signed_message.signature.hex()
     
+    def forget_signer(self, mnemonic: str):
+        """Drop a wallet's derived key from the signer cache"""
+        self.signer_cache.evict(mnemonic)
+    
     def verify_signature(self, address: str, message: str, signature: str) -> bool:
         """Verify a signature"""
-        try:
-            signable_message = encode_defunct(text=message)
-            recovered_address = Account.recover_message(
-                signable_message, 
-                signature=signature
-            )
-            return recovered_address.lower() == address.lower()
-        except Exception:
-            return False
+        return self.signature_verifier.verify(address, message, signature)
+    
+    def verify_signatures(self, batch: List[Dict]) -> List[bool]:
+        """Verify many {'address', 'message', 'signature'} items in parallel; one result per item"""
+        return self.signature_verifier.verify_batch(batch)
+    
+    def _check_slippage(self, usd_amount: float, original_eth_price: float,
+                        current_quote: Optional[Dict] = None) -> Optional[str]:
+        """Error message if the ETH price moved more than 1% since the quote, else None"""
+        if current_quote is None:
+            current_quote = self.get_usd_to_eth_quote(usd_amount)
+        if current_quote['success']:
+            current_rate = current_quote['rate']
+            price_change = abs(current_rate - original_eth_price) / original_eth_price
+            
+            if price_change > 0.01:  # 1% tolerance
+                return f'Price changed by {price_change*100:.2f}%. Transaction rejected for your protection.'
+        return None
     
     def execute_transaction(self, from_address: str, to_address: str, 
                           amount_eth: float, signature: str, message: str,
                           original_usd_amount: Optional[float] = None,
-                          original_eth_price: Optional[float] = None) -> Dict:
-        """Execute a signed transaction"""
+                          original_eth_price: Optional[float] = None,
+                          notify: bool = False, current_quote: Optional[Dict] = None,
+                          nonce: Optional[str] = None) -> Dict:
+        """Execute a signed transaction (notify=True queues the email in the same commit)
+        
+        `message` must be exactly the one prepare_transaction built for these
+        addresses and amounts. `current_quote` is an already fetched quote for the
+        slippage check.
+        """
         try:
+            # The signature must cover these exact addresses and amounts
+            expected = self.transaction_message(from_address, to_address, amount_eth,
+                                                original_usd_amount, nonce)
+            if message != expected:
+                return {'success': False, 'error': 'Message does not match the transaction'}
+            
             # Verify signature
             if not self.verify_signature(from_address, message, signature):
                 return {'success': False, 'error': 'Invalid signature'}
             
             # For USD transactions, check price slippage
             if original_usd_amount and original_eth_price:
-                current_quote = self.get_usd_to_eth_quote(original_usd_amount)
-                if current_quote['success']:
-                    current_rate = current_quote['rate']
-                    price_change = abs(current_rate - original_eth_price) / original_eth_price
-                    
-                    if price_change > 0.01:  # 1% tolerance
-                        return {
-                            'success': False, 
-                            'error': f'Price changed by {price_change*100:.2f}%. Transaction rejected for your protection.'
-                        }
-            
-            # Check balance again
-            sender_balance = self.get_balance(from_address)
-            if amount_eth > sender_balance:
-                return {'success': False, 'error': 'Insufficient balance'}
-            
-            # Execute transfer
-            self.db.transfer_balance(from_address, to_address, amount_eth)
-            
-            # Record transaction
+                slippage_error = self._check_slippage(original_usd_amount, original_eth_price,
+                                                      current_quote)
+                if slippage_error:
+                    return {'success': False, 'error': slippage_error}
+            
+            # Execute transfer and record it in one commit; the balance is
+            # re-checked inside the write transaction
             usd_amount = original_usd_amount if original_usd_amount else None
-            self.db.add_transaction(from_address, to_address, amount_eth, usd_amount)
+            notification = None
+            if notify:
+                notification = {
+                    'from_address': from_address,
+                    'to_address': to_address,
+                    'amount_eth': amount_eth,
+                    'amount_usd': usd_amount
+                }
+            result = self.db.transfer_and_record(from_address, to_address, amount_eth,
+                                                 usd_amount, notification)
+            
+            return {
+                'success': True,
+                'tx_id': result['tx_id'],
+                'from_balance': result['from_balance'],
+                'to_balance': result['to_balance']
+            }
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def prepare_batch_payout(self, from_address: str, legs: List[Dict]) -> Dict:
+        """Price a batch of {'address', 'amount', 'currency'} legs and build the one message to sign
+        
+        All USD legs share a single quote; the message commits to every priced
+        leg through a Merkle root.
+        """
+        if not legs:
+            raise ValueError("Batch payout has no legs")
+        for number, leg in enumerate(legs, start=1):
+            if leg['currency'] not in CURRENCIES:
+                raise ValueError(f"Leg {number}: currency must be ETH or USD")
+            if not leg['amount'] > 0:
+                raise ValueError(f"Leg {number}: amount must be positive")
+        
+        usd_total = sum(leg['amount'] for leg in legs if leg['currency'] == "USD")
+        eth_price = None
+        if usd_total > 0:
+            quote = self.get_usd_to_eth_quote(usd_total)
+            if not quote['success']:
+                raise ValueError(quote['error'])
+            eth_price = quote['rate']
+        
+        priced_legs = []
+        for leg in legs:
+            if not validate_ethereum_address(leg['address']):
+                raise ValueError(f"Invalid recipient address {leg['address']}")
+            if leg['currency'] == "USD":
+                priced_legs.append({
+                    'to_address': leg['address'],
+                    'amount_eth': leg['amount'] / eth_price,
+                    'amount_usd': leg['amount']
+                })
+            else:
+                priced_legs.append({
+                    'to_address': leg['address'],
+                    'amount_eth': leg['amount'],
+                    'amount_usd': None
+                })
+        
+        total_eth = sum(leg['amount_eth'] for leg in priced_legs)
+        sender_balance = self.get_balance(from_address)
+        if total_eth > sender_balance:
+            raise ValueError(f"Insufficient balance. Required: {total_eth:.6f} ETH, Available: {sender_balance:.6f} ETH")
+        
+        commitment = commit_legs(from_address, priced_legs)
+        nonce = os.urandom(16).hex()
+        
+        return {
+            'from_address': from_address,
+            'legs': priced_legs,
+            'total_eth': total_eth,
+            'total_usd': usd_total or None,
+            'original_eth_price': eth_price,
+            'merkle_root': commitment['merkle_root'],
+            'nonce': nonce,
+            'message': payout_message(from_address, len(priced_legs), total_eth, commitment['merkle_root'], nonce),
+            'created_at': time.time()
+        }
+    
+    def execute_batch_payout(self, payout: Dict, signature: str) -> Dict:
+        """Verify one signature over the batch's Merkle root and apply every leg in one commit
+        
+        Each prepared payout carries a nonce; a batch can be executed once per nonce.
+        """
+        try:
+            from_address = payout['from_address']
+            legs = payout['legs']
+            nonce = payout.get('nonce')
+            if not nonce:
+                return {'success': False, 'error': 'Batch payout has no nonce'}
+            
+            # Rebuild the commitment from the legs themselves, so any edit to a
+            # leg after signing changes the message and fails verification
+            commitment = commit_legs(from_address, legs)
+            total_eth = sum(leg['amount_eth'] for leg in legs)
+            message = payout_message(from_address, len(legs), total_eth, commitment['merkle_root'], nonce)
             
-            return {'success': True}
+            if not self.verify_signature(from_address, message, signature):
+                return {'success': False, 'error': 'Invalid signature'}
+            
+            if payout.get('total_usd') and payout.get('original_eth_price'):
+                slippage_error = self._check_slippage(payout['total_usd'], payout['original_eth_price'])
+                if slippage_error:
+                    return {'success': False, 'error': slippage_error}
+            
+            result = self.db.record_batch_payout(
+                from_address, legs, commitment['merkle_root'], signature,
+                commitment['leaves'], commitment['proofs'], nonce
+            )
             
+            return {
+                'success': True,
+                'batch_id': result['batch_id'],
+                'merkle_root': commitment['merkle_root'],
+                'leg_count': len(legs),
+                'from_balance': result['from_balance']
+            }
+        
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_transaction_history(self, address: str) -> List[Dict]:
-        """Get transaction history for an address"""
-        return self.db.get_transactions(address)
+    def get_transaction_history(self, address: str, before: Optional[str] = None,
+                                limit: int = 50, direction: Optional[str] = None,
+                                counterparty: Optional[str] = None, since: Optional[str] = None,
+                                until: Optional[str] = None) -> List[Dict]:
+        """Get transaction history for an address (pass a row's 'cursor' as `before` for the next page)
+        
+        Filters (direction 'sent'/'received', counterparty, [since, until)) are applied in SQL.
+        """
+        return self.db.get_transactions(address, before=before, limit=limit, direction=direction,
+                                        counterparty=counterparty, since=since, until=until)
+    
+    def export_transaction_history(self, address: str, file_format: str, out: IO,
+                                   since: Optional[str] = None, until: Optional[str] = None) -> int:
+        """Stream an address's transactions to `out` in csv/jsonl/parquet/arrow; returns rows written"""
+        rows = self.db.iter_transactions(address=address, since=since, until=until)
+        return export_transactions(rows, file_format, out)
+    
+    def get_address_stats(self, address: str) -> Dict:
+        """Transaction count, totals sent/received, USD volume and first/last activity"""
+        return self.db.get_address_stats(address)